@@ -0,0 +1,52 @@
+from typing import NamedTuple, Callable
+
+from numpy import ndarray
+
+from img_proc import cloneImage, convertTo3Channel
+
+
+class DrawCall(NamedTuple):
+    layer: str
+    function: Callable
+    args: tuple
+    kwargs: dict
+
+
+class DisplayList:
+    """
+    Recorded drawing calls (e.g. drawPoints, drawLine, drawCircle) grouped into named layers. Nothing is drawn (and
+    no image is copied) until the display list is rendered onto an image.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def add(self, layer: str, function: Callable, *args, **kwargs) -> None:
+        """
+        Records drawing call.
+        :param layer: layer name
+        :param function: drawing function - takes target image as the first argument and changes it in-place
+        :param args: other arguments of the drawing function
+        :param kwargs: keyword arguments of the drawing function
+        """
+        self.calls.append(DrawCall(layer, function, args, kwargs))
+
+    @property
+    def layers(self) -> list:
+        """
+        :return: names of the layers, in order of the first call
+        """
+        return list(dict.fromkeys(call.layer for call in self.calls))
+
+    def render(self, image: ndarray, layers: list = None) -> ndarray:
+        """
+        Draws the recorded calls onto a single copy of the image.
+        :param image: background image (grayscale images are converted to BGR)
+        :param layers: names of the drawn layers (all if not given)
+        :return: annotated copy of the image
+        """
+        canvas = convertTo3Channel(image) if image.ndim == 2 else cloneImage(image)
+        for call in self.calls:
+            if layers is None or call.layer in layers:
+                call.function(canvas, *call.args, **call.kwargs)
+        return canvas
@@ -0,0 +1,215 @@
+"""
+Batch gesture classification of a directory of images or of a manifest file.
+
+    python batch.py --dir images [--workers 4] [--threads] [--output results.jsonl] [--angleOffset 15 ...]
+    python batch.py --manifest images/manifest.txt [--cache .stage_cache] [--cacheSize 256]
+    python batch.py --dir images --metrics metrics.prom
+
+Manifest line format: image path (relative to the manifest) followed by its ImageParam overrides, e.g.
+    paper_11.jpg --rotationAngle 90 --takeUpperHalf 1
+
+Results are streamed as JSON lines (one per image, in order of completion), summary is written to stderr.
+With --cache, contours and convexity defects are stored on disk (keyed by hash of the image file and the edge
+detection parameters), so repeated runs over the same images skip decoding and edge detection. Workers share the
+cache directory and its size limit.
+With --metrics, stage durations, latencies and counts of images, errors, gestures and found key points are written
+as JSON (or in Prometheus text format if the file has .prom extension).
+"""
+import json
+import os
+import re
+import shlex
+import sys
+import time
+from argparse import ArgumentParser
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+
+from gesture_pipeline import GesturePipeline
+from gesture_recognition import countKeyPoints, recordKeyPointCounts
+from image_param import ImageParam
+from io_utils import parseArguments, parseArgumentsMap
+from metrics import Metrics, TIME_BUCKETS, writeMetrics
+from stage_cache import StageCache
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+LABEL_PATTERN = re.compile(r"^(rock|paper|scissors)[_\-.]", re.IGNORECASE)
+
+# pipelines of the worker (one per cache directory) - created on the first task, shared by the threads of the worker
+workerPipelines = {}
+workerPipelinesLock = Lock()
+
+
+def labelFromFileName(path: str) -> str:
+    """
+    Extracts gesture label from the image file name - e.g. rock_3.jpg -> rock.
+    :param path: image path
+    :return: gesture label or None if file name is not labeled
+    """
+    match = LABEL_PATTERN.match(os.path.basename(path))
+    return match.group(1).lower() if match else None
+
+
+def listDirectory(directory: str, params: ImageParam) -> list:
+    """
+    Creates classification tasks for all images in the directory.
+    :param directory: directory with images
+    :param params: image parameters of all images
+    :return: list of (image path, params) tasks
+    """
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS))
+    return [(os.path.join(directory, name), params) for name in names]
+
+
+def readManifestEntries(manifestPath: str) -> list:
+    """
+    Reads the manifest file.
+    :param manifestPath: path of the manifest
+    :return: list of (image path, map of per-image parameter overrides)
+    """
+    entries = []
+    baseDir = os.path.dirname(manifestPath)
+    with open(manifestPath) as manifest:
+        for line in manifest:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            path, *arguments = shlex.split(line)
+            entries.append((os.path.join(baseDir, path), parseArgumentsMap(arguments)))
+    return entries
+
+
+def readManifest(manifestPath: str, params: ImageParam) -> list:
+    """
+    Creates classification tasks from the manifest file.
+    :param manifestPath: path of the manifest
+    :param params: image parameters the per-image overrides are applied to
+    :return: list of (image path, params) tasks
+    """
+    return [(path, params.setParams(**overrides)) for path, overrides in readManifestEntries(manifestPath)]
+
+
+def getWorkerPipeline(cacheDir: str = None, cacheBytes: int = None) -> GesturePipeline:
+    """
+    :param cacheDir: directory of the stage cache (no cache if not given)
+    :param cacheBytes: size limit of the stage cache
+    :return: pipeline of the worker using the given cache
+    """
+    with workerPipelinesLock:
+        pipeline = workerPipelines.get(cacheDir)
+        if pipeline is None:
+            pipeline = GesturePipeline(StageCache(cacheDir, cacheBytes) if cacheDir else None)
+            workerPipelines[cacheDir] = pipeline
+    return pipeline
+
+
+def classifyImage(task: tuple) -> dict:
+    """
+    Classifies a single image - meant to be run in a worker process or thread.
+    :param task: (image path, image parameters, profile flag[, cache directory, cache size limit in bytes])
+    :return: JSON-serializable record with the result, key point counts, latency and (optionally) per-stage
+    durations
+    """
+    path, params, profile, *cache = task
+    label = labelFromFileName(path)
+    record = {"path": path, "label": label}
+    start = time.perf_counter()
+    try:
+        stages = getWorkerPipeline(*cache).evaluateFile(path, params)
+        record.update(stages["gesture"].toDict())
+        # counted here - metrics of the worker processes are not merged
+        record["keyPoints"] = countKeyPoints(stages["fingerParams"])
+        if profile:
+            record["stagesMs"] = {name: round(seconds * 1000, 3) for name, seconds in stages.profile}
+        record["correct"] = None if label is None else record["gesture"] == label
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["latencyMs"] = round((time.perf_counter() - start) * 1000, 3)
+    return record
+
+
+def recordMetrics(record: dict, metrics: Metrics) -> None:
+    """
+    Records result of a single image in the metrics.
+    :param record: record returned by classifyImage
+    :param metrics: metrics registry
+    """
+    metrics.increment("images")
+    metrics.observe("latency_seconds", record["latencyMs"] / 1000, TIME_BUCKETS)
+    for name, milliseconds in record.get("stagesMs", {}).items():
+        metrics.observe(f"{name}_seconds", milliseconds / 1000, TIME_BUCKETS)
+    if "error" in record:
+        metrics.increment("errors")
+        return
+    metrics.increment(f"gesture_{record['gesture']}")
+    metrics.observe("fingers", len(record["fingers"]))
+    # hands, defects, merged points, valleys and removed fingers - as recorded by a pipeline with metrics
+    recordKeyPointCounts(record["keyPoints"], metrics)
+
+
+def runBatch(tasks: list, workers: int, output, threads: bool = False, metrics: Metrics = None) -> dict:
+    """
+    Classifies images in a pool of processes (or threads) and streams the results as JSON lines.
+    :param tasks: list of (image path, params, profile flag) tasks
+    :param workers: number of workers
+    :param output: file object the results are written to
+    :param threads: use pool of threads instead of processes
+    :param metrics: metrics registry the results are recorded in (stage durations only if profiled)
+    :return: summary of the run
+    """
+    summary = {"images": 0, "errors": 0, "labeled": 0, "correct": 0}
+    start = time.perf_counter()
+    with (ThreadPool if threads else Pool)(workers) as pool:
+        for record in pool.imap_unordered(classifyImage, tasks):
+            if metrics is not None:
+                recordMetrics(record, metrics)
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            summary["images"] += 1
+            summary["errors"] += "error" in record
+            if record.get("correct") is not None:
+                summary["labeled"] += 1
+                summary["correct"] += record["correct"]
+    seconds = time.perf_counter() - start
+    summary["seconds"] = round(seconds, 3)
+    summary["imagesPerSecond"] = round(summary["images"] / seconds, 2) if seconds > 0 else None
+    summary["accuracy"] = round(summary["correct"] / summary["labeled"], 4) if summary["labeled"] else None
+    return summary
+
+
+def main(arguments: list):
+    parser = ArgumentParser(description="Batch rock-paper-scissors gesture classification.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="directory with images")
+    source.add_argument("--manifest", help="manifest with image paths and per-image parameters")
+    parser.add_argument("--workers", type=int, default=cpu_count(), help="number of workers")
+    parser.add_argument("--threads", action="store_true", help="use threads instead of processes")
+    parser.add_argument("--output", help="JSON lines output file (default: stdout)")
+    parser.add_argument("--profile", action="store_true", help="report duration of every stage that ran")
+    parser.add_argument("--cache", help="directory of the on-disk cache of contours and convexity defects")
+    parser.add_argument("--cacheSize", type=float, default=256, help="size limit of the cache in MB")
+    parser.add_argument("--metrics", help="metrics output file (JSON, or Prometheus text format if *.prom)")
+    args, paramArguments = parser.parse_known_args(arguments)
+    params = parseArguments(paramArguments)
+
+    tasks = readManifest(args.manifest, params) if args.manifest else listDirectory(args.dir, params)
+    cacheBytes = int(args.cacheSize * 1024 * 1024)
+    tasks = [(path, imageParams, args.profile, args.cache, cacheBytes) for path, imageParams in tasks]
+    metrics = Metrics() if args.metrics else None
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        summary = runBatch(tasks, max(1, args.workers), output, args.threads, metrics)
+    finally:
+        if args.output:
+            output.close()
+    if metrics is not None:
+        writeMetrics(metrics, args.metrics)
+    print(f"{summary['images']} images ({summary['errors']} errors) in {summary['seconds']} s - "
+          f"{summary['imagesPerSecond']} images/s", file=sys.stderr)
+    if summary["labeled"]:
+        print(f"Accuracy: {summary['correct']}/{summary['labeled']} = {summary['accuracy']:.2%}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,393 @@
+"""
+Benchmarks of the processing stages on the bundled image corpus.
+
+    python benchmark.py morphology [--dir images] [--scales 1,2,4] [--repeat 3]
+    python benchmark.py stages [--dir images] [--scales 0.5,1,2] [--repeat 5] [--save baseline.json]
+    python benchmark.py stages --baseline baseline.json [--tolerance 0.2]
+    python benchmark.py contours [--manifest images/manifest.txt] [--settings none,simple,0.001,0.002] [--repeat 5]
+    python benchmark.py segmentation [--manifest images/manifest.txt] [--repeat 5]
+
+The stages benchmark times every stage of the recognition separately (on the outputs of the previous stages) over
+the corpus images resized by the given factors and reports p50/p95/p99 durations. Results can be saved as a JSON
+baseline - comparison with a baseline reports stages whose p50 got slower by more than the tolerance and exits with
+status 1 if there are any.
+The contours benchmark runs the recognition with every contour fidelity setting ("none" - all boundary points,
+"simple" - CHAIN_APPROX_SIMPLE, number - polygon approximation tolerance relative to the contour perimeter) and
+reports the size of the hand contour, accuracy, agreement with the full contours (same gesture and credibility),
+errors and p50 durations of the contour stages and of the stages that run on the hand contour.
+The segmentation benchmark compares the segmentation methods with the Canny edges in the same way - agreement is
+measured against the Canny method, durations of the stages from the grayscale image to the hand contour are reported.
+"""
+import json
+import os
+import platform
+import sys
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+from cv2 import imread, resize, INTER_NEAREST, INTER_AREA, INTER_LINEAR, CHAIN_APPROX_NONE, CHAIN_APPROX_SIMPLE, \
+    __version__ as cvVersion
+
+from batch import labelFromFileName, readManifestEntries
+from constants import MASK_DILATE_ITER, MASK_ERODE_ITER, SEGMENTATION_CANNY, SEGMENTATION_COMPONENTS, SEGMENTATION_SKIN
+from gesture_pipeline import GesturePipeline, prepareImage, detectEdges, blurImage, closeEdges, findHandContour, \
+    createHandMask
+from gesture_recognition import findFingerParams, determineGesture
+from hand_finger_detection import findPalmRoot, findClosePointsArray, mergeClosePointsArray, \
+    calculateRootToPointsDistancesArray, removeCollinearFingers, findFingerValleysMask, FingerCandidates
+from image_param import ImageParam, DEFAULT_PARAMS
+from img_contours import fillConvex, findImageContours, findConvexityDefects, getDefectGeometry
+from img_proc import applyDilation, applyErosion, emptyImage, convertColorSpace
+from morphology import closeMask
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+PERCENTILES = (50, 95, 99)
+BASELINE_VERSION = 1
+# slowdowns below this (in milliseconds) are measurement noise, not regressions
+REGRESSION_MIN_MS = 0.05
+# stages whose durations depend on the contour fidelity
+CONTOUR_STAGES = ("contours", "maxContour", "defects", "fingerParams", "gesture")
+# stages of the segmentation methods (from the grayscale image to the hand contour)
+SEGMENTATION_STAGES = ("cannyEdges", "blurredEdges", "edges", "blurredGray", "skin", "foreground", "contours",
+                       "maxContour")
+SEGMENTATION_NAMES = {SEGMENTATION_CANNY: "canny", SEGMENTATION_COMPONENTS: "components", SEGMENTATION_SKIN: "skin"}
+
+
+def loadCorpus(directory: str) -> list:
+    """
+    Reads all images from the directory.
+    :param directory: directory with images
+    :return: list of (image name, BGR image)
+    """
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS))
+    return [(name, imread(os.path.join(directory, name))) for name in names]
+
+
+def timeCall(function, repeat: int) -> tuple:
+    """
+    Measures duration of the function call.
+    :param function: function without arguments
+    :param repeat: number of measured calls
+    :return: (list of durations in seconds, result of the last call)
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return durations, result
+
+
+def filledContoursMask(image: np.ndarray) -> np.ndarray:
+    """
+    :param image: BGR image
+    :return: uint8 mask with filled contours - input of the mask refinement
+    """
+    stages = GesturePipeline().evaluate(image)
+    mask = emptyImage(stages["edges"].shape, np.uint8)
+    for c in stages["contours"]:
+        fillConvex(mask, c, 255)
+    return mask
+
+
+def benchmarkMorphology(corpus: list, scales: list, repeat: int) -> list:
+    """
+    Compares the iterated 3x3 float64 mask dilation/erosion with closeMask on uint8 masks of the corpus images,
+    upscaled by the given factors.
+    :param corpus: list of (image name, image)
+    :param scales: upscaling factors
+    :param repeat: number of measured calls per image
+    :return: list of result rows (dicts)
+    """
+    masks = [filledContoursMask(image) for _, image in corpus]
+    rows = []
+    for scale in scales:
+        iteratedTimes, closeTimes, pixels, identical = [], [], [], True
+        for mask in masks:
+            if scale != 1:
+                mask = resize(mask, None, fx=scale, fy=scale, interpolation=INTER_NEAREST)
+            pixels.append(mask.size)
+            floatMask = mask.astype(np.float64)
+            durations, expected = timeCall(lambda: applyErosion(applyDilation(floatMask, None, MASK_DILATE_ITER),
+                                                                None, MASK_ERODE_ITER), repeat)
+            iteratedTimes.extend(durations)
+            durations, result = timeCall(lambda: closeMask(mask, MASK_DILATE_ITER, MASK_ERODE_ITER), repeat)
+            closeTimes.extend(durations)
+            identical = identical and bool((result == expected).all())
+        iteratedMs = np.median(iteratedTimes) * 1000
+        closeMs = np.median(closeTimes) * 1000
+        rows.append({"scale": scale, "megapixels": round(np.mean(pixels) / 1e6, 2),
+                     "iteratedMs": round(iteratedMs, 3), "closeMaskMs": round(closeMs, 3),
+                     "speedup": round(iteratedMs / closeMs, 1), "identical": identical})
+    return rows
+
+
+def timeStages(image: np.ndarray, params: ImageParam, repeat: int) -> dict:
+    """
+    Times every stage of the recognition on the outputs of the previous stages.
+    :param image: BGR image
+    :param params: image parameters
+    :param repeat: number of measured calls per stage
+    :return: map of stage names and lists of durations in seconds (stages after a failure are missing)
+    """
+    timings = {}
+
+    def run(name, function):
+        durations, result = timeCall(function, repeat)
+        timings[name] = durations
+        return result
+
+    prepared = run("prepareImage", lambda: prepareImage(image, params))
+    gray = run("convertColorSpace", lambda: convertColorSpace(prepared, "grayscale"))
+    cannyEdges = run("applyCannyEdge", lambda: detectEdges(gray, params))
+    blurredEdges = run("applyGaussianBlur", lambda: blurImage(cannyEdges, params))
+    edges = run("closeEdges", lambda: closeEdges(blurredEdges))
+    contours = run("findImageContours", lambda: findImageContours(edges))
+    run("createHandMask", lambda: createHandMask(edges, contours, params))
+    if len(contours) == 0:
+        return timings
+    maxContour = run("findMaxContour", lambda: findHandContour(contours))
+    defects = run("findConvexityDefects", lambda: findConvexityDefects(maxContour))
+    geometry = run("getDefectGeometry", lambda: getDefectGeometry(maxContour, defects))
+    points = [tuple(point) for point in geometry.start.tolist()]
+    if len(points) < 2:
+        return timings
+    rootPoint = run("findPalmRoot", lambda: findPalmRoot(points))
+    clusterIds = run("findClosePointsArray", lambda: findClosePointsArray(geometry.start, params))
+    merged = run("mergeClosePointsArray", lambda: mergeClosePointsArray(geometry.start, clusterIds))
+    rootDistances, _ = run("calculateRootToPointsDistancesArray",
+                           lambda: calculateRootToPointsDistancesArray(rootPoint, merged))
+    mergedPoints = [tuple(point) for point in merged.tolist()]
+    run("removeCollinearFingers", lambda: removeCollinearFingers(mergedPoints, params))
+
+    def filterFingerCandidates():
+        candidates = FingerCandidates(mergedPoints, rootDistances.tolist(), rootPoint)
+        candidates.removeCutoffAngles(params)
+        candidates.removeCollinear(params)
+        candidates.keepFarthest()
+        return candidates
+
+    run("FingerCandidates", filterFingerCandidates)
+    run("findFingerValleysMask", lambda: findFingerValleysMask(geometry.start, geometry.end, geometry.far))
+    fingerParams = run("findFingerParams", lambda: findFingerParams(maxContour, params, defects))
+    if fingerParams.distances:
+        run("determineGesture", lambda: determineGesture(None, fingerParams.fingers, fingerParams.rootPoint,
+                                                         fingerParams.distances, fingerParams.valleys, params))
+    return timings
+
+
+def resizeImage(image: np.ndarray, scale: float) -> np.ndarray:
+    """
+    :param image: input image
+    :param scale: resize factor
+    :return: resized image (synthetic resolution)
+    """
+    if scale == 1:
+        return image
+    return resize(image, None, fx=scale, fy=scale, interpolation=INTER_AREA if scale < 1 else INTER_LINEAR)
+
+
+def benchmarkStages(corpus: list, scales: list, repeat: int, params: ImageParam = DEFAULT_PARAMS) -> list:
+    """
+    Times every stage over the corpus images resized by the given factors.
+    :param corpus: list of (image name, image)
+    :param scales: resize factors
+    :param repeat: number of measured calls per stage and image
+    :param params: image parameters
+    :return: list of result rows (dicts) - stage, scale, number of samples and duration percentiles in milliseconds
+    """
+    rows = []
+    for scale in scales:
+        timings = {}
+        for _, image in corpus:
+            for name, durations in timeStages(resizeImage(image, scale), params, repeat).items():
+                timings.setdefault(name, []).extend(durations)
+        for name, durations in timings.items():
+            row = {"stage": name, "scale": scale, "samples": len(durations)}
+            for percentile, value in zip(PERCENTILES, np.percentile(durations, PERCENTILES)):
+                row[f"p{percentile}Ms"] = round(float(value) * 1000, 4)
+            rows.append(row)
+    return rows
+
+
+def parseContourSetting(setting: str) -> dict:
+    """
+    :param setting: contour fidelity setting - "none", "simple" or polygon approximation tolerance
+    :return: map of the contour image parameters
+    """
+    if setting == "none":
+        return {"contourApproximation": CHAIN_APPROX_NONE, "contourTolerance": 0}
+    if setting == "simple":
+        return {"contourApproximation": CHAIN_APPROX_SIMPLE, "contourTolerance": 0}
+    return {"contourApproximation": CHAIN_APPROX_NONE, "contourTolerance": float(setting)}
+
+
+def compareSettings(entries: list, settings: list, stages: tuple, repeat: int,
+                    params: ImageParam = DEFAULT_PARAMS) -> list:
+    """
+    Runs the recognition over the corpus with every setting and compares the results with the first (reference)
+    setting.
+    :param entries: list of (image path, map of per-image parameter overrides)
+    :param settings: list of (setting name, map of the image parameters of the setting)
+    :param stages: names of the timed stages
+    :param repeat: number of measured evaluations per image
+    :param params: image parameters the overrides are applied to
+    :return: list of result rows (dicts) - hand contour size, accuracy, agreement with the reference (same gesture
+    and credibility), errors and p50 durations of the stages in milliseconds
+    """
+    corpus = [(labelFromFileName(path), imread(path), params.setParams(**overrides)) for path, overrides in entries]
+    pipeline = GesturePipeline()
+    reference = [None] * len(corpus)
+    rows = []
+    for settingIndex, (setting, settingParams) in enumerate(settings):
+        timings, points, correct, agreed, errors = {}, [], 0, 0, 0
+        for i, (label, image, imageParams) in enumerate(corpus):
+            imageParams = imageParams.setParams(**settingParams)
+            for _ in range(repeat):
+                evaluation = pipeline.evaluate(image, imageParams)
+                try:
+                    result = evaluation["gesture"]
+                    outcome = (result.gesture, result.credibility)
+                except Exception as e:
+                    outcome = type(e).__name__
+                for name, seconds in evaluation.profile:
+                    if name in stages:
+                        timings.setdefault(name, []).append(seconds)
+            if "maxContour" in evaluation.values:
+                points.append(len(evaluation["maxContour"]))
+            if settingIndex == 0:
+                reference[i] = outcome
+            if isinstance(outcome, str):
+                errors += 1
+            else:
+                correct += outcome[0] == label
+            agreed += outcome == reference[i]
+        row = {"setting": setting, "contourPoints": round(float(np.mean(points)), 1) if points else 0,
+               "accuracy": round(correct / len(corpus), 3), "agreement": round(agreed / len(corpus), 3),
+               "errors": errors}
+        for name in stages:
+            row[f"{name}Ms"] = round(float(np.median(timings.get(name, [0]))) * 1000, 3)
+        row["totalMs"] = round(sum(row[f"{name}Ms"] for name in stages), 3)
+        rows.append(row)
+    return rows
+
+
+def saveBaseline(rows: list, path: str, repeat: int) -> None:
+    """
+    Writes benchmark results as a JSON baseline.
+    :param rows: result rows of benchmarkStages
+    :param path: output path
+    :param repeat: number of measured calls per stage and image
+    """
+    baseline = {
+        "version": BASELINE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cvVersion,
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "results": rows,
+    }
+    with open(path, "w") as output:
+        json.dump(baseline, output, indent=2)
+
+
+def compareBaseline(rows: list, path: str, tolerance: float) -> list:
+    """
+    Compares benchmark results with the baseline.
+    :param rows: result rows of benchmarkStages
+    :param path: baseline path
+    :param tolerance: allowed relative slowdown of p50 (e.g. 0.2 = 20 %)
+    :return: list of comparison rows (dicts) of the stages measured in both runs
+    """
+    with open(path) as baselineFile:
+        baseline = json.load(baselineFile)
+    baselineRows = {(row["stage"], row["scale"]): row for row in baseline["results"]}
+    comparison = []
+    for row in rows:
+        baselineRow = baselineRows.get((row["stage"], row["scale"]))
+        if baselineRow is None:
+            continue
+        before, after = baselineRow["p50Ms"], row["p50Ms"]
+        ratio = after / before if before > 0 else float("inf")
+        regression = ratio > 1 + tolerance and after - before > REGRESSION_MIN_MS
+        comparison.append({"stage": row["stage"], "scale": row["scale"], "baselineP50Ms": before, "p50Ms": after,
+                           "ratio": round(ratio, 2), "regression": regression})
+    return comparison
+
+
+def printRows(rows: list) -> None:
+    """
+    Prints result rows as a table.
+    :param rows: list of dicts with the same keys
+    """
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[column]).rjust(width) for column, width in zip(columns, widths)))
+
+
+def main(arguments: list):
+    parser = ArgumentParser(description="Benchmarks of the processing stages.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    morphology = commands.add_parser("morphology", help="iterated float64 mask morphology vs closeMask on uint8")
+    morphology.add_argument("--dir", default="images", help="directory with images")
+    morphology.add_argument("--scales", default="1,2,4", help="comma separated upscaling factors")
+    morphology.add_argument("--repeat", type=int, default=3, help="number of measured calls per image")
+    stages = commands.add_parser("stages", help="p50/p95/p99 duration of every stage, baselines and regressions")
+    stages.add_argument("--dir", default="images", help="directory with images")
+    stages.add_argument("--scales", default="0.5,1,2", help="comma separated resize factors")
+    stages.add_argument("--repeat", type=int, default=5, help="number of measured calls per stage and image")
+    stages.add_argument("--save", help="write results as a JSON baseline")
+    stages.add_argument("--baseline", help="compare results with the JSON baseline")
+    stages.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown of p50")
+    contours = commands.add_parser("contours", help="accuracy and stage durations of the contour fidelity settings")
+    contours.add_argument("--manifest", default="images/manifest.txt", help="manifest with images and parameters")
+    contours.add_argument("--settings", default="none,simple,0.0005,0.001,0.002",
+                          help="comma separated settings - none, simple or polygon approximation tolerance")
+    contours.add_argument("--repeat", type=int, default=5, help="number of measured evaluations per image")
+    segmentation = commands.add_parser("segmentation", help="accuracy, agreement and stage durations of the "
+                                                           "segmentation methods")
+    segmentation.add_argument("--manifest", default="images/manifest.txt", help="manifest with images and parameters")
+    segmentation.add_argument("--repeat", type=int, default=5, help="number of measured evaluations per image")
+    args = parser.parse_args(arguments)
+
+    if args.command == "contours":
+        settings = ["none"] + [setting for setting in args.settings.split(",") if setting != "none"]
+        rows = compareSettings(readManifestEntries(args.manifest),
+                               [(setting, parseContourSetting(setting)) for setting in settings], CONTOUR_STAGES,
+                               args.repeat)
+        printRows([row for row in rows if row["setting"] in args.settings.split(",")])
+        return
+    if args.command == "segmentation":
+        settings = [(name, {"segmentation": method}) for method, name in SEGMENTATION_NAMES.items()]
+        printRows(compareSettings(readManifestEntries(args.manifest), settings, SEGMENTATION_STAGES, args.repeat))
+        return
+    corpus = loadCorpus(args.dir)
+    scales = [float(scale) for scale in args.scales.split(",")]
+    if args.command == "morphology":
+        printRows(benchmarkMorphology(corpus, scales, args.repeat))
+    elif args.command == "stages":
+        rows = benchmarkStages(corpus, scales, args.repeat)
+        printRows(rows)
+        if args.save:
+            saveBaseline(rows, args.save, args.repeat)
+        if args.baseline:
+            comparison = compareBaseline(rows, args.baseline, args.tolerance)
+            print()
+            printRows(comparison)
+            regressions = [row for row in comparison if row["regression"]]
+            if regressions:
+                print(f"{len(regressions)} stage(s) slower than the baseline by more than {args.tolerance:.0%}.",
+                      file=sys.stderr)
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -5,3 +5,18 @@ CANNY_THRESH_2 = 100
 MASK_DILATE_ITER = 20
 MASK_ERODE_ITER = 20
 MASK_COLOR = (0.0, 0.0, 0.0)  # In BGR format
+WORKING_HEIGHT = 800  # height the pixel-based image parameters are tuned for
+ROI_PADDING = 0.25  # relative to the larger side of the hand bounding box
+ROI_MIN_PADDING = 16
+
+# == Segmentation methods (ImageParam.segmentation) == #
+SEGMENTATION_CANNY = 0  # Canny edges closed by blurring and morphology, contours of the whole image
+SEGMENTATION_COMPONENTS = 1  # Otsu thresholding, contour of the largest connected component
+SEGMENTATION_SKIN = 2  # skin color lookup table, contours of the skin mask
+SEGMENTATION_METHODS = (SEGMENTATION_CANNY, SEGMENTATION_COMPONENTS, SEGMENTATION_SKIN)
+
+# == Skin color (OpenCV HSV ranges - hue 0-180, saturation and value 0-255) == #
+SKIN_HUE_RANGES = ((0, 30), (165, 180))  # red hues wrap around 180
+SKIN_SATURATION_RANGE = (20, 255)
+SKIN_VALUE_RANGE = (40, 255)
+SKIN_LUT_BITS = 5  # bits per BGR channel of the skin lookup table index
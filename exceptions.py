@@ -11,3 +11,8 @@ class InvalidCommandLineArgsError(Exception):
 class ImageNotFoundError(Exception):
     def __init__(self, message):
         super().__init__(message)
+
+
+class HandNotFoundError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
@@ -0,0 +1,267 @@
+"""
+Columnar store of the hand geometry the gesture decision works on (fingers, root point, root distances and valleys of
+every image) and vectorized re-scoring of the whole store with new decision thresholds - no image processing.
+
+    python feature_store.py export --manifest images/manifest.txt --output features.npz [--angleOffset 15 ...]
+    python feature_store.py score features.npz [--verify] [--repeat 100] [--valleyDepthThreshold 60 ...]
+
+Variable-length columns (fingers, distances, valleys) are stored flat with per-image lengths. Geometry is in the
+working scale coordinates of each image, pixel thresholds are rescaled by the stored parameter scale as in the
+pipeline. With --verify, the vectorized decision is compared with determineGesture called for every image.
+"""
+import sys
+import time
+from argparse import ArgumentParser
+from typing import NamedTuple
+
+import numpy as np
+
+from batch import labelFromFileName, readManifestEntries
+from gesture_pipeline import GesturePipeline
+from gesture_recognition import FingerParams, determineGesture
+from image_param import ImageParam, DEFAULT_PARAMS
+from io_utils import parseArguments
+
+# codes of the decision outputs in the scored arrays
+GESTURE_CODES = (None, "rock", "paper", "scissors")
+CREDIBILITY_CODES = ("uncertain", "certain", "uncertain - rock properties", "uncertain - paper properties")
+NONE, ROCK, PAPER, SCISSORS = range(len(GESTURE_CODES))
+UNCERTAIN, CERTAIN, ROCK_PROPERTIES, PAPER_PROPERTIES = range(len(CREDIBILITY_CODES))
+# number of the highest fingers that must be long enough for a certain paper (as in determineGesture)
+LONGEST_FINGERS = 3
+
+
+class FeatureStore(NamedTuple):
+    paths: np.ndarray  # (N,) image paths
+    labels: np.ndarray  # (N,) labels from the file names ("" if not labeled)
+    paramScales: np.ndarray  # (N,) factors the pixel thresholds are multiplied by
+    rootPoints: np.ndarray  # (N, 2)
+    fingers: np.ndarray  # (F, 2) fingers of all images
+    fingerLengths: np.ndarray  # (N,) number of fingers of every image
+    distancePoints: np.ndarray  # (D, 2) finger candidates with root distances
+    distances: np.ndarray  # (D,) root distances
+    distanceLengths: np.ndarray  # (N,)
+    valleys: np.ndarray  # (V, 3, 2) start, end and far points of the valleys
+    valleyLengths: np.ndarray  # (N,)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    @classmethod
+    def fromHands(cls, hands: list) -> "FeatureStore":
+        """
+        :param hands: list of (image path, parameter scale, finger parameters)
+        :return: store of the hands
+        """
+        def flat(values: list, shape: tuple, dtype) -> np.ndarray:
+            return np.array(values, dtype=dtype).reshape((-1,) + shape)
+
+        paths = [path for path, _, _ in hands]
+        params = [fingerParams for _, _, fingerParams in hands]
+        return cls(
+            np.array(paths, dtype=str),
+            np.array([labelFromFileName(path) or "" for path in paths], dtype=str),
+            flat([paramScale for _, paramScale, _ in hands], (), np.float64),
+            flat([p.rootPoint for p in params], (2,), np.int64),
+            flat([finger for p in params for finger in p.fingers], (2,), np.int64),
+            flat([len(p.fingers) for p in params], (), np.int64),
+            flat([point for p in params for point in p.distances], (2,), np.int64),
+            flat([distance for p in params for distance in p.distances.values()], (), np.float64),
+            flat([len(p.distances) for p in params], (), np.int64),
+            flat([valley for p in params for valley in p.valleys], (3, 2), np.int64),
+            flat([len(p.valleys) for p in params], (), np.int64),
+        )
+
+    def save(self, path: str) -> None:
+        np.savez(path, **self._asdict())
+
+    @classmethod
+    def load(cls, path: str) -> "FeatureStore":
+        with np.load(path) as data:
+            return cls(**{field: data[field] for field in cls._fields})
+
+    def hand(self, i: int) -> tuple:
+        """
+        :param i: index of the image
+        :return: (fingers, root point, root distances, valleys) in the form determineGesture takes them
+        """
+        def rows(lengths, values, convert):
+            start = int(lengths[:i].sum())
+            return [convert(value) for value in values[start:start + lengths[i]].tolist()]
+
+        fingers = rows(self.fingerLengths, self.fingers, tuple)
+        points = rows(self.distanceLengths, self.distancePoints, tuple)
+        distances = dict(zip(points, rows(self.distanceLengths, self.distances, float)))
+        valleys = rows(self.valleyLengths, self.valleys, lambda valley: tuple(map(tuple, valley)))
+        return fingers, tuple(self.rootPoints[i].tolist()), distances, valleys
+
+
+def padColumn(values: np.ndarray, lengths: np.ndarray, fill) -> np.ndarray:
+    """
+    :param values: flat column values
+    :param lengths: number of values of every row
+    :param fill: value of the padding
+    :return: (N, max length) array of the values, rows padded at the end
+    """
+    width = int(lengths.max()) if len(lengths) else 0
+    padded = np.full((len(lengths), width), fill, dtype=np.result_type(values.dtype, type(fill)))
+    padded[np.arange(width) < lengths[:, None]] = values
+    return padded
+
+
+def scoreStore(store: FeatureStore, params: ImageParam = DEFAULT_PARAMS) -> tuple:
+    """
+    Vectorized determineGesture over the whole store - the same decisions (including the evaluation order quirks of
+    the conditions) for every image at once.
+    :param store: feature store
+    :param params: image parameters with the decision thresholds
+    :return: ((N,) gesture codes, (N,) credibility codes) - indices into GESTURE_CODES and CREDIBILITY_CODES
+    """
+    count = len(store)
+    gestures = np.full(count, NONE)
+    credibility = np.full(count, UNCERTAIN)
+    if count == 0:
+        return gestures, credibility
+    fingerCount, valleyCount = store.fingerLengths, store.valleyLengths
+    rootY = store.rootPoints[:, 1]
+
+    def threshold(name):
+        # pixel thresholds are rescaled by the parameter scale of every image
+        return getattr(params, name) * store.paramScales
+
+    # fingers sorted by height - the first is the (first) highest finger, the last is the last of the lowest ones
+    fingerY = padColumn(store.fingers[:, 1], fingerCount, np.inf)
+    fingerX = padColumn(store.fingers[:, 0], fingerCount, 0)
+    lowestY = np.where(np.isinf(fingerY), -np.inf, fingerY)
+    lastLowest = fingerY.shape[1] - 1 - np.argmax(lowestY[:, ::-1], axis=1)
+    highestY = fingerY.min(axis=1)
+    lowestX = fingerX[np.arange(count), lastLowest]
+    heightSpread = lowestY.max(axis=1) - highestY
+    # the longest fingers are long enough if the shortest of them is (rows with fewer fingers are not paper candidates)
+    sortedY = np.sort(fingerY, axis=1)
+    shortestLongY = sortedY[:, LONGEST_FINGERS - 1] if sortedY.shape[1] >= LONGEST_FINGERS else np.inf
+    longFingers = rootY - shortestLongY >= threshold("longestFingersHeightsThreshold")
+
+    distanceStarts = np.concatenate(([0], np.cumsum(store.distanceLengths)[:-1])).astype(np.intp)
+    distanceSpread = np.maximum.reduceat(store.distances, distanceStarts) - \
+        np.minimum.reduceat(store.distances, distanceStarts)
+    differentFingers = (heightSpread > threshold("fingersLengthDiff")) & \
+        (distanceSpread > threshold("minMaxFingerDist"))
+
+    # first valley of every image (zeros if there is none)
+    valleyStarts = np.concatenate(([0], np.cumsum(valleyCount)[:-1])).astype(np.intp)
+    hasValley = valleyCount > 0
+    valley = np.zeros((count, 3, 2), dtype=np.int64)
+    valley[hasValley] = store.valleys[valleyStarts[hasValley]]
+    (startX, startY), (endX, endY), (farX, farY) = valley[:, 0].T, valley[:, 1].T, valley[:, 2].T
+    a = np.sqrt(((startX - farX) ** 2 + (startY - farY) ** 2).astype(np.float64))
+    b = np.sqrt(((endX - farX) ** 2 + (endY - farY) ** 2).astype(np.float64))
+    depth = threshold("valleyDepthThreshold")
+    # (x > depth and y) > depth compares False with the depth when x is not above it
+    deepSides = np.where(farY - startY > depth, farY - endY > depth, 0 > depth)
+    scissorsValley = ((np.abs(startY - endY) < threshold("valleyTopPointsHeightDiff")) &
+                      (farY - np.maximum(startY, endY) > depth)) | (a >= params.valleySidesLengthFactor * b) | \
+        (highestY - lowestX > threshold("fingersHeightDiff")) | deepSides
+
+    # single valley - scissors or paper, always certain
+    oneValley = valleyCount == 1
+    scissors = (fingerCount == 2) | ((fingerCount != 5) & scissorsValley)
+    gestures[oneValley] = np.where(scissors, SCISSORS, PAPER)[oneValley]
+    credibility[oneValley] = CERTAIN
+    # otherwise rock if there are less than five fingers
+    fewFingers = ~oneValley & (fingerCount < 5)
+    gestures[fewFingers] = ROCK
+    credibility[fewFingers] = CERTAIN
+    # more valleys - paper if there are exactly five fingers or the fingers differ, undecided otherwise
+    manyFingers = ~oneValley & ~fewFingers
+    paper = manyFingers & hasValley & ((fingerCount == 5) | differentFingers)
+    gestures[paper] = PAPER
+    credibility[paper] = np.where(longFingers, CERTAIN, ROCK_PROPERTIES)[paper]
+    # no valleys - paper only if the fingers differ and are long enough
+    noValleys = manyFingers & ~hasValley
+    paper = differentFingers & longFingers
+    gestures[noValleys] = np.where(paper, PAPER, ROCK)[noValleys]
+    credibility[noValleys] = np.where(paper, ROCK_PROPERTIES, PAPER_PROPERTIES)[noValleys]
+    return gestures, credibility
+
+
+def scoreHands(store: FeatureStore, params: ImageParam = DEFAULT_PARAMS) -> tuple:
+    """
+    Reference scoring - determineGesture called for every image of the store.
+    :param store: feature store
+    :param params: image parameters with the decision thresholds
+    :return: ((N,) gesture codes, (N,) credibility codes)
+    """
+    gestures = np.full(len(store), NONE)
+    credibility = np.full(len(store), UNCERTAIN)
+    for i in range(len(store)):
+        fingers, rootPoint, distances, valleys = store.hand(i)
+        gesture, decisionCredibility = determineGesture(None, fingers, rootPoint, distances, valleys,
+                                                        params.scaled(store.paramScales[i]))
+        gestures[i] = GESTURE_CODES.index(gesture)
+        credibility[i] = CREDIBILITY_CODES.index(decisionCredibility)
+    return gestures, credibility
+
+
+def exportFeatureStore(entries: list, params: ImageParam = DEFAULT_PARAMS,
+                       pipeline: GesturePipeline = None) -> FeatureStore:
+    """
+    Runs the image processing once and collects the geometry of the found hands.
+    :param entries: list of (image path, map of per-image parameter overrides)
+    :param params: image parameters the overrides are applied to
+    :param pipeline: recognition pipeline (new one if not given)
+    :return: store of the images where a hand with finger candidates was found
+    """
+    pipeline = pipeline or GesturePipeline()
+    hands = []
+    for path, overrides in entries:
+        try:
+            evaluation = pipeline.evaluateFile(path, params.setParams(**overrides))
+            fingerParams: FingerParams = evaluation["fingerParams"]
+        except Exception as e:
+            print(f"{path}: {type(e).__name__}: {e}", file=sys.stderr)
+            continue
+        if fingerParams.distances:
+            hands.append((path, evaluation["paramScale"], fingerParams))
+    return FeatureStore.fromHands(hands)
+
+
+def main(arguments: list):
+    parser = ArgumentParser(description="Columnar store of the hand geometry and vectorized re-scoring.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="process the images and write the geometry of the hands")
+    export.add_argument("--manifest", default="images/manifest.txt", help="manifest with images and parameters")
+    export.add_argument("--output", default="features.npz", help="output store (npz)")
+    score = commands.add_parser("score", help="re-score the store with the decision thresholds")
+    score.add_argument("store", help="feature store (npz)")
+    score.add_argument("--verify", action="store_true", help="compare with determineGesture called per image")
+    score.add_argument("--repeat", type=int, default=100, help="number of timed scoring passes")
+    args, paramArguments = parser.parse_known_args(arguments)
+    params = parseArguments(paramArguments)
+
+    if args.command == "export":
+        store = exportFeatureStore(readManifestEntries(args.manifest), params)
+        store.save(args.output)
+        print(f"{len(store)} hands written to {args.output}", file=sys.stderr)
+        return
+    store = FeatureStore.load(args.store)
+    start = time.perf_counter()
+    for _ in range(max(1, args.repeat)):
+        gestures, credibility = scoreStore(store, params)
+    milliseconds = (time.perf_counter() - start) / max(1, args.repeat) * 1000
+    names = np.array(GESTURE_CODES, dtype=object)[gestures]
+    labeled = store.labels != ""
+    correct = int((names[labeled] == store.labels[labeled]).sum())
+    print(f"{len(store)} hands scored in {milliseconds:.3f} ms - accuracy {correct}/{int(labeled.sum())}")
+    if args.verify:
+        start = time.perf_counter()
+        expected = scoreHands(store, params)
+        loopMilliseconds = (time.perf_counter() - start) * 1000
+        mismatches = int(((gestures != expected[0]) | (credibility != expected[1])).sum())
+        print(f"determineGesture per image: {loopMilliseconds:.3f} ms - {mismatches} mismatches")
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
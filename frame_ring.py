@@ -0,0 +1,87 @@
+from multiprocessing.shared_memory import SharedMemory
+from typing import NamedTuple
+
+from numpy import ndarray, copyto
+
+
+class SharedFrame(NamedTuple):
+    slot: int  # index of the ring slot holding the pixels
+    shape: tuple
+    dtype: str
+
+
+class FrameRing:
+    """
+    Ring of shared memory buffers used to pass frames to worker processes. The owner writes a frame into a free slot
+    and sends only the (small) SharedFrame reference to the worker, which reads the pixels in place - without pickling
+    the image. A slot must not be written again before the worker that reads it is finished.
+    """
+
+    def __init__(self, buffers: list, owner: bool):
+        self.buffers = buffers
+        self.owner = owner
+
+    @classmethod
+    def create(cls, slots: int, slotBytes: int) -> "FrameRing":
+        """
+        :param slots: number of slots
+        :param slotBytes: size of a slot - size of the largest frame
+        :return: new ring owned by the calling process
+        """
+        buffers = []
+        try:
+            for _ in range(slots):
+                buffers.append(SharedMemory(create=True, size=max(1, slotBytes)))
+        except Exception:
+            for buffer in buffers:
+                buffer.close()
+                buffer.unlink()
+            raise
+        return cls(buffers, True)
+
+    @classmethod
+    def attach(cls, names: list) -> "FrameRing":
+        """
+        :param names: names of the slots of the ring created by another process
+        :return: ring attached to the existing slots
+        """
+        return cls([SharedMemory(name) for name in names], False)
+
+    @property
+    def names(self) -> list:
+        return [buffer.name for buffer in self.buffers]
+
+    @property
+    def slots(self) -> int:
+        return len(self.buffers)
+
+    def write(self, slot: int, image: ndarray) -> SharedFrame:
+        """
+        Copies the image into the slot.
+        :param slot: index of the slot
+        :param image: image (frame)
+        :return: reference to the frame passed to the worker
+        """
+        frame = SharedFrame(slot, image.shape, image.dtype.str)
+        if image.nbytes > self.buffers[slot].size:
+            raise ValueError(f"Frame of {image.nbytes} bytes does not fit into a slot of {self.buffers[slot].size} "
+                             f"bytes.")
+        copyto(self.view(frame), image)
+        return frame
+
+    def view(self, frame: SharedFrame) -> ndarray:
+        """
+        :param frame: reference to the frame
+        :return: image backed by the shared memory of the slot (not a copy)
+        """
+        return ndarray(frame.shape, frame.dtype, self.buffers[frame.slot].buf)
+
+    def close(self) -> None:
+        """
+        Closes the slots in this process - the owner also frees them.
+        """
+        for buffer in self.buffers:
+            buffer.close()
+            if self.owner:
+                buffer.unlink()
+        self.buffers = []
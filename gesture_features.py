@@ -0,0 +1,200 @@
+"""
+Fixed-length feature vectors of the found hand key points and a NumPy nearest-centroid classifier trained on them,
+evaluated side by side with the rule-based determineGesture.
+
+    python gesture_features.py [--manifest images/manifest.txt] [--repeat 100] [--save classifier.npz]
+
+Reports accuracy of the rules and of the classifier (on the training corpus and leave-one-out), their agreement and
+throughput of both - rules one image at a time, classifier on the whole (N, F) feature matrix in one call.
+"""
+import sys
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from batch import labelFromFileName, readManifestEntries
+from exceptions import InvalidArgumentTypeOrValueError
+from gesture_pipeline import GesturePipeline
+from gesture_recognition import FingerParams, determineGesture
+from image_param import DEFAULT_PARAMS
+
+GESTURES = ("rock", "paper", "scissors")
+# lengths are relative to the radius of the minimum enclosing circle of the hand
+FEATURE_NAMES = ("fingers", "valleys", "possibleFingers", "minDistance", "maxDistance", "distanceSpread",
+                 "fingerHeightSpread", "meanFingerLength", "minFingerLength", "valleyTopHeightDiff", "valleyDepth",
+                 "valleySidesRatio")
+# number of the highest fingers the finger lengths are measured on (as in determineGesture)
+LONGEST_FINGERS = 3
+
+
+def extractFeatures(fingerParams: FingerParams) -> np.ndarray:
+    """
+    Converts the key points used by determineGesture into a feature vector - counts of fingers and valleys, root
+    distances, finger heights and geometry of the first valley, with lengths relative to the hand size.
+    :param fingerParams: finger parameters of the hand
+    :return: (F,) float32 vector, features in order of FEATURE_NAMES
+    """
+    features = np.zeros(len(FEATURE_NAMES), dtype=np.float32)
+    radius = max(1.0, float(fingerParams.enclosingCircle[1]))
+    fingers = np.asarray(fingerParams.fingers, dtype=np.float64).reshape(-1, 2)
+    distances = np.fromiter(fingerParams.distances.values(), dtype=np.float64)
+    rootY = fingerParams.rootPoint[1]
+    features[0] = len(fingers)
+    features[1] = len(fingerParams.valleys)
+    features[2] = len(fingerParams.possibleFingers)
+    if distances.size:
+        features[3] = distances.min() / radius
+        features[4] = distances.max() / radius
+        features[5] = features[4] - features[3]
+    if len(fingers):
+        lengths = np.sort(rootY - fingers[:, 1])[::-1][:LONGEST_FINGERS]
+        features[6] = np.ptp(fingers[:, 1]) / radius
+        features[7] = lengths.mean() / radius
+        features[8] = lengths.min() / radius
+    if fingerParams.valleys:
+        start, end, far = (np.asarray(point, dtype=np.float64) for point in fingerParams.valleys[0])
+        features[9] = abs(start[1] - end[1]) / radius
+        features[10] = (far[1] - max(start[1], end[1])) / radius
+        features[11] = np.linalg.norm(start - far) / max(1.0, float(np.linalg.norm(end - far)))
+    return features
+
+
+class NearestCentroidClassifier:
+    """
+    Nearest-centroid classifier on standardized features - classifies the whole (N, F) feature matrix at once.
+    """
+
+    def __init__(self, mean: np.ndarray = None, scale: np.ndarray = None, centroids: np.ndarray = None,
+                 labels: tuple = GESTURES):
+        self.mean = mean
+        self.scale = scale
+        self.centroids = centroids
+        self.labels = tuple(labels)
+
+    def fit(self, features: np.ndarray, labels: list) -> "NearestCentroidClassifier":
+        """
+        :param features: (N, F) feature matrix
+        :param labels: N labels (classes without samples get no centroid and are never predicted)
+        :return: the trained classifier
+        """
+        features = np.asarray(features, dtype=np.float32)
+        labels = np.asarray(labels)
+        self.mean = features.mean(axis=0)
+        std = features.std(axis=0)
+        self.scale = np.where(std > 0, 1 / np.where(std > 0, std, 1), 0).astype(np.float32)
+        standardized = (features - self.mean) * self.scale
+        centroids = np.full((len(self.labels), features.shape[1]), np.inf, dtype=np.float32)
+        for i, label in enumerate(self.labels):
+            if np.any(labels == label):
+                centroids[i] = standardized[labels == label].mean(axis=0)
+        self.centroids = centroids
+        return self
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """
+        :param features: (N, F) feature matrix
+        :return: (N,) array of predicted labels
+        """
+        if self.centroids is None:
+            raise InvalidArgumentTypeOrValueError("Classifier must be trained or loaded first.")
+        standardized = (np.asarray(features, dtype=np.float32) - self.mean) * self.scale
+        # squared distances to all centroids - |x|^2 - 2 x.c + |c|^2, |x|^2 does not change the order
+        trained = np.isfinite(self.centroids[:, 0])
+        centroids = np.where(trained[:, None], self.centroids, 0)
+        scores = standardized @ centroids.T * -2 + (centroids ** 2).sum(axis=1)
+        scores[:, ~trained] = np.inf
+        return np.asarray(self.labels)[scores.argmin(axis=1)]
+
+    def save(self, path: str) -> None:
+        np.savez(path, mean=self.mean, scale=self.scale, centroids=self.centroids, labels=np.asarray(self.labels))
+
+    @classmethod
+    def load(cls, path: str) -> "NearestCentroidClassifier":
+        with np.load(path) as data:
+            return cls(data["mean"], data["scale"], data["centroids"], tuple(data["labels"].tolist()))
+
+
+def leaveOneOutAccuracy(features: np.ndarray, labels: list) -> float:
+    """
+    :param features: (N, F) feature matrix
+    :param labels: N labels
+    :return: accuracy of the classifiers trained without the classified sample
+    """
+    labels = np.asarray(labels)
+    correct = 0
+    for i in range(len(labels)):
+        keep = np.arange(len(labels)) != i
+        classifier = NearestCentroidClassifier().fit(features[keep], labels[keep])
+        correct += classifier.predict(features[i:i + 1])[0] == labels[i]
+    return correct / len(labels) if len(labels) else 0.0
+
+
+def collectFeatures(entries: list, params=DEFAULT_PARAMS) -> tuple:
+    """
+    Runs the recognition over the labeled images.
+    :param entries: list of (image path, map of per-image parameter overrides)
+    :param params: image parameters the overrides are applied to
+    :return: (list of (finger parameters, image parameters) of the recognized hands, their labels, (N, F) features)
+    """
+    pipeline = GesturePipeline()
+    hands, labels = [], []
+    for path, overrides in entries:
+        label = labelFromFileName(path)
+        if label is None:
+            continue
+        imageParams = params.setParams(**overrides)
+        try:
+            evaluation = pipeline.evaluateFile(path, imageParams)
+            evaluation["gesture"]
+        except Exception as e:
+            print(f"{path}: {type(e).__name__}: {e}", file=sys.stderr)
+            continue
+        hands.append((evaluation["fingerParams"], imageParams.scaled(evaluation["paramScale"])))
+        labels.append(label)
+    features = np.array([extractFeatures(fingerParams) for fingerParams, _ in hands], dtype=np.float32)
+    return hands, labels, features.reshape(len(hands), len(FEATURE_NAMES))
+
+
+def main(arguments: list):
+    parser = ArgumentParser(description="Feature vector classifier vs the rule-based gesture decision.")
+    parser.add_argument("--manifest", default="images/manifest.txt", help="manifest with labeled images")
+    parser.add_argument("--repeat", type=int, default=100, help="number of timed passes over the corpus")
+    parser.add_argument("--save", help="write the classifier trained on the whole corpus (npz)")
+    args = parser.parse_args(arguments)
+
+    hands, labels, features = collectFeatures(readManifestEntries(args.manifest))
+    if not hands:
+        raise SystemExit("No labeled images recognized.")
+    repeat = max(1, args.repeat)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rules = [determineGesture(None, fingerParams.fingers, fingerParams.rootPoint, fingerParams.distances,
+                                  fingerParams.valleys, params)[0] for fingerParams, params in hands]
+    rulesSeconds = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        vectors = np.array([extractFeatures(fingerParams) for fingerParams, _ in hands], dtype=np.float32)
+    featuresSeconds = (time.perf_counter() - start) / repeat
+    classifier = NearestCentroidClassifier().fit(vectors, labels)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        predicted = classifier.predict(features)
+    predictSeconds = (time.perf_counter() - start) / repeat
+
+    labels = np.asarray(labels)
+    count = len(labels)
+    print(f"{count} labeled hands, {len(FEATURE_NAMES)} features")
+    print(f"rules:      accuracy {np.mean(np.asarray(rules) == labels):.3f}, "
+          f"{count / rulesSeconds:,.0f} hands/s (one at a time)")
+    print(f"classifier: accuracy {np.mean(predicted == labels):.3f} (training), "
+          f"{leaveOneOutAccuracy(features, labels):.3f} (leave-one-out), {count / predictSeconds:,.0f} hands/s "
+          f"(batch), {count / (featuresSeconds + predictSeconds):,.0f} hands/s with feature extraction")
+    print(f"agreement with the rules: {np.mean(predicted == np.asarray(rules)):.3f}")
+    if args.save:
+        classifier.save(args.save)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
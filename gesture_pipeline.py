@@ -0,0 +1,511 @@
+from functools import partial
+from typing import NamedTuple
+
+from cv2 import resize, medianBlur, INTER_AREA, INTER_LINEAR, error as CvError
+from numpy import ndarray, uint8, float64
+
+from constants import MASK_DILATE_ITER, MASK_ERODE_ITER, WORKING_HEIGHT, SEGMENTATION_CANNY, SEGMENTATION_COMPONENTS, \
+    SEGMENTATION_SKIN, SEGMENTATION_METHODS
+from exceptions import HandNotFoundError, InvalidArgumentTypeOrValueError, ImageNotFoundError
+from annotations import DisplayList
+from gesture_recognition import findFingerParams, determineGesture, FingerParams, recordFingerMetrics, \
+    annotateFingerParams, FINGERS_LAYER
+from image_decoding import decodeImage, decodeGrayImage, readImageShape
+from image_param import ImageParam, DEFAULT_PARAMS, scaleKernelSize
+from metrics import Metrics
+from img_contours import findImageContours, findMaxContour, fillConvex, findConvexityDefects, simplifyContour
+from img_draw import drawImageContours, drawText
+from img_proc import rotateImage, isExactRotation, findEdgeNonBlackPixel, getImageUpperPart, convertColorSpace, \
+    applyCannyEdge, applyGaussianBlur, applyDilation, applyErosion, emptyImage, cloneImage, convertToSingleChannel
+from morphology import closeMask
+from segmentation import thresholdForeground, findComponentContours, segmentSkin
+from stage_cache import StageCache
+from stage_graph import StageGraph, StageEvaluation
+
+
+# image parameters each of the stages depends on
+ROTATION_FIELDS = ("rotationAngle",)
+PREPARE_FIELDS = ("rotationAngle", "takeUpperHalf")
+CANNY_FIELDS = ("cannyThreshold1", "cannyThreshold2")
+BLUR_FIELDS = ("blurSize",)
+CONTOUR_FIELDS = ("contourApproximation",)
+HAND_CONTOUR_FIELDS = ("contourTolerance",)
+FINGER_FIELDS = ("consecutivePointsDistThreshold", "consecutivePointsCoordOffset", "angleOffset", "cutoffAngles",
+                 "angleBounds")
+SCALE_FIELDS = ("workingHeight",)
+DECISION_FIELDS = ("valleyTopPointsHeightDiff", "valleyDepthThreshold", "valleySidesLengthFactor", "fingersHeightDiff",
+                   "fingersLengthDiff", "minMaxFingerDist", "longestFingersHeightsThreshold")
+
+
+def toPoint(point) -> tuple:
+    """
+    Converts point with numpy coordinates to the tuple of python integers.
+    :param point: point (x, y)
+    :return: point as a tuple of ints
+    """
+    return int(point[0]), int(point[1])
+
+
+class GestureResult(NamedTuple):
+    gesture: str
+    credibility: str
+    fingers: list
+    valleys: list
+    rootPoint: tuple
+
+    def toDict(self) -> dict:
+        """
+        :return: result as a JSON-serializable dict
+        """
+        return {
+            "gesture": self.gesture,
+            "credibility": self.credibility,
+            "fingers": [list(finger) for finger in self.fingers],
+            "valleys": [[list(point) for point in valley] for valley in self.valleys],
+            "rootPoint": list(self.rootPoint),
+        }
+
+
+def readEncodedImageShape(imageBytes: bytes) -> tuple:
+    """
+    :param imageBytes: content of the image file
+    :return: (height, width) of the image - read from the header (decoded if the format is not supported)
+    """
+    shape = readImageShape(imageBytes)
+    return shape if shape is not None else decodeGrayImage(imageBytes).shape[:2]
+
+
+def findWorkingScale(shape: tuple, params: ImageParam = DEFAULT_PARAMS) -> float:
+    """
+    :param shape: shape of the input image
+    :param params: image parameters
+    :return: factor the image is resized by before processing - images higher than the working height are downscaled
+    """
+    height = shape[0]
+    if params.workingHeight <= 0 or height <= params.workingHeight:
+        return 1.0
+    return params.workingHeight / height
+
+
+def findParamScale(params: ImageParam = DEFAULT_PARAMS) -> float:
+    """
+    :param params: image parameters
+    :return: factor the pixel-based parameters are multiplied by - they are tuned for WORKING_HEIGHT high images and
+    applied to the image resized to the working height (1 without the working height - used as given)
+    """
+    if params.workingHeight <= 0:
+        return 1.0
+    return params.workingHeight / WORKING_HEIGHT
+
+
+def resizeToScale(image: ndarray, shape: tuple, scale: float) -> ndarray:
+    """
+    :param image: input image (possibly decoded at a reduced size)
+    :param shape: shape of the original image
+    :param scale: resize factor (downscaling) of the original image
+    :return: resized image
+    """
+    size = (max(1, round(shape[1] * scale)), max(1, round(shape[0] * scale)))
+    if image.shape[1::-1] == size:
+        return image
+    # area interpolation is fast only for integer factors - reduce by the integer factor first, rest is interpolated
+    factor = min(image.shape[1] // size[0], image.shape[0] // size[1])
+    if factor >= 2:
+        image = resize(image, (image.shape[1] // factor, image.shape[0] // factor), interpolation=INTER_AREA)
+    return resize(image, size, interpolation=INTER_LINEAR)
+
+
+def scaleResult(result: "GestureResult", factor: float) -> "GestureResult":
+    """
+    :param result: recognition result
+    :param factor: factor the coordinates are multiplied by
+    :return: recognition result with rescaled coordinates
+    """
+    if factor == 1:
+        return result
+
+    def scalePoint(point):
+        return int(round(point[0] * factor)), int(round(point[1] * factor))
+
+    return result._replace(fingers=[scalePoint(finger) for finger in result.fingers],
+                           valleys=[tuple(scalePoint(point) for point in valley) for valley in result.valleys],
+                           rootPoint=scalePoint(result.rootPoint))
+
+
+def rotateWorkingImage(image: ndarray, params: ImageParam = DEFAULT_PARAMS) -> ndarray:
+    """
+    :param image: input image
+    :param params: image parameters
+    :return: image rotated by rotationAngle
+    """
+    return rotateImage(image, params.rotationAngle)
+
+
+def findRotationCrop(image: ndarray, params: ImageParam = DEFAULT_PARAMS) -> tuple:
+    """
+    Finds rows of the rotated image without the black borders left by the rotation onto the original canvas (all
+    rows if the rotation is exact).
+    :param image: rotated image
+    :param params: image parameters
+    :return: (first row, end row) - kept rows of the image
+    """
+    firstRow, endRow = 0, image.shape[0]
+    if params.rotationAngle != 0 and not isExactRotation(params.rotationAngle):
+        row = findEdgeNonBlackPixel(image)
+        if row is not None:
+            firstRow = row
+        row = findEdgeNonBlackPixel(image[firstRow:], "end")
+        if row is not None:
+            endRow = firstRow + row + 1
+    return firstRow, endRow
+
+
+def cropImage(image: ndarray, rows: tuple, params: ImageParam = DEFAULT_PARAMS) -> ndarray:
+    """
+    Crops the rotated image to the given rows and to the upper part if takeUpperHalf is set.
+    :param image: rotated image
+    :param rows: (first row, end row) - kept rows of the image
+    :param params: image parameters
+    :return: cropped image
+    """
+    image = image[rows[0]:rows[1], :]
+    if params.takeUpperHalf:
+        image = getImageUpperPart(image, 1.5)  # parametrize this
+    return image
+
+
+def prepareImage(image: ndarray, params: ImageParam = DEFAULT_PARAMS) -> ndarray:
+    """
+    Rotates and crops the image according to the image parameters (rotationAngle, takeUpperHalf).
+    :param image: input image
+    :param params: image parameters
+    :return: rotated and cropped image
+    """
+    image = rotateWorkingImage(image, params)
+    return cropImage(image, findRotationCrop(image, params), params)
+
+
+def closeEdges(edges: ndarray) -> ndarray:
+    """
+    Morphological processing of the edges image - single dilation followed by single erosion.
+    :param edges: edges image
+    :return: processed edges image
+    """
+    edges = applyDilation(edges, None, iterations=1)
+    return applyErosion(edges, None, iterations=1)
+
+
+def detectEdges(gray: ndarray, params: ImageParam = DEFAULT_PARAMS) -> ndarray:
+    """
+    Canny edge detection with the thresholds from the image parameters.
+    :param gray: grayscale image
+    :param params: image parameters
+    :return: edges image
+    """
+    return applyCannyEdge(gray, int(params.cannyThreshold1), int(params.cannyThreshold2))
+
+
+def blurImage(image: ndarray, params: ImageParam = DEFAULT_PARAMS, paramScale: float = 1.0) -> ndarray:
+    """
+    Gaussian blur with the kernel size from the image parameters.
+    :param image: input image
+    :param params: image parameters
+    :param paramScale: factor the pixel-based parameters are multiplied by
+    :return: blurred image
+    """
+    blurSize = scaleKernelSize(int(params.blurSize), paramScale)
+    return applyGaussianBlur(image, (blurSize, blurSize))
+
+
+def smoothMask(mask: ndarray, params: ImageParam = DEFAULT_PARAMS, paramScale: float = 1.0) -> ndarray:
+    """
+    Median blur of the binary mask with the kernel size from the image parameters - removes isolated pixels and thin
+    structures (their contours would self-intersect).
+    :param mask: uint8 mask
+    :param params: image parameters
+    :param paramScale: factor the pixel-based parameters are multiplied by
+    :return: smoothed mask
+    """
+    return medianBlur(mask, scaleKernelSize(int(params.blurSize), paramScale))
+
+
+def extractEdges(image: ndarray, params: ImageParam = DEFAULT_PARAMS) -> ndarray:
+    """
+    Finds edges of the prepared (BGR) image - Canny edge detection followed by blurring and morphological processing.
+    :param image: prepared image
+    :param params: image parameters
+    :return: single-channel edges image
+    """
+    gray = convertColorSpace(image, "grayscale")
+    return closeEdges(blurImage(detectEdges(gray, params), params))
+
+
+def findEdgeContours(edges: ndarray, params: ImageParam = DEFAULT_PARAMS) -> list:
+    """
+    Finds external contours of the edges image with the approximation method from the image parameters.
+    :param edges: edges image
+    :param params: image parameters
+    :return: list of contours
+    """
+    return findImageContours(edges, method=int(params.contourApproximation))
+
+
+def findForegroundContours(foreground: ndarray, params: ImageParam = DEFAULT_PARAMS) -> list:
+    """
+    Finds contour of the largest connected component of the foreground mask.
+    :param foreground: foreground mask
+    :param params: image parameters
+    :return: list with the contour of the component (empty if there is no foreground)
+    """
+    return findComponentContours(foreground, int(params.contourApproximation))
+
+
+def findHandContour(contours: list, params: ImageParam = DEFAULT_PARAMS) -> ndarray:
+    """
+    Finds contour of the hand - the contour with the largest area, simplified with the tolerance from the image
+    parameters (convex hull and convexity defects of the simplified contour are cheaper to find). Simplified contour
+    may intersect itself - if its convexity defects cannot be found, the contour is used as found.
+    :param contours: list of contours
+    :param params: image parameters
+    :return: contour of the hand
+    """
+    if len(contours) == 0:
+        raise HandNotFoundError("No contour found in the image.")
+    contour = findMaxContour(contours)
+    simplified = simplifyContour(contour, params.contourTolerance)
+    if simplified is contour:
+        return contour
+    try:
+        findConvexityDefects(simplified)
+    except CvError:
+        return contour
+    return simplified
+
+
+def drawContoursImage(image: ndarray, contours: list) -> ndarray:
+    """
+    :param image: prepared image
+    :param contours: found contours
+    :return: copy of the image with all contours drawn
+    """
+    contourImage = cloneImage(image)
+    drawImageContours(contourImage, contours, (255, 255, 255), 2)
+    return contourImage
+
+
+def createHandMask(edges: ndarray, contours: list, params: ImageParam = DEFAULT_PARAMS,
+                   paramScale: float = 1.0) -> ndarray:
+    """
+    Creates binary mask of the hand - filled contours refined by dilation, erosion and blurring.
+    :param edges: edges image (determines mask shape)
+    :param contours: found contours
+    :param params: image parameters
+    :param paramScale: factor the pixel-based parameters (and mask iterations) are multiplied by
+    :return: single-channel mask
+    """
+    mask = emptyImage(edges.shape, uint8)
+    for c in contours:
+        fillConvex(mask, c, 255)
+    mask = closeMask(mask, max(1, round(MASK_DILATE_ITER * paramScale)), max(1, round(MASK_ERODE_ITER * paramScale)))
+    # blurring (and conversion) stays in float64, as before
+    mask = blurImage(mask.astype(float64), params, paramScale)
+    return convertToSingleChannel(mask)
+
+
+def findHandFingerParams(maxContour: ndarray, params: ImageParam = DEFAULT_PARAMS, defects: ndarray = None,
+                         paramScale: float = 1.0, metrics: Metrics = None) -> FingerParams:
+    """
+    Finds finger parameters of the hand contour (in the working scale coordinates).
+    :param maxContour: contour of the hand
+    :param params: image parameters
+    :param defects: convexity defects of the contour
+    :param paramScale: factor the pixel-based parameters are multiplied by
+    :param metrics: metrics registry the key point counts are recorded in
+    :return: finger parameters of the hand
+    """
+    fingerParams = findFingerParams(maxContour, params.scaled(paramScale), defects)
+    if metrics is not None:
+        recordFingerMetrics(fingerParams, metrics)
+    return fingerParams
+
+
+def recognizeGesture(fingerParams: FingerParams, params: ImageParam = DEFAULT_PARAMS, scale: float = 1.0,
+                     paramScale: float = 1.0) -> GestureResult:
+    """
+    Recognizes gesture from the found finger parameters.
+    :param fingerParams: finger parameters of the hand
+    :param params: image parameters
+    :param scale: working scale of the image - coordinates of the result are mapped back to the original image
+    :param paramScale: factor the pixel-based parameters are multiplied by
+    :return: recognition result
+    """
+    if not fingerParams.distances:
+        raise HandNotFoundError("No finger candidates found in the hand contour.")
+    gesture, credibility = determineGesture(None, fingerParams.fingers, fingerParams.rootPoint, fingerParams.distances,
+                                            fingerParams.valleys, params.scaled(paramScale))
+    fingers = [toPoint(finger) for finger in fingerParams.fingers]
+    valleys = [tuple(toPoint(point) for point in valley) for valley in fingerParams.valleys]
+    result = GestureResult(gesture, credibility, fingers, valleys, toPoint(fingerParams.rootPoint))
+    return scaleResult(result, 1 / scale)
+
+
+def annotateResult(fingerParams: FingerParams, result: GestureResult) -> DisplayList:
+    """
+    :param fingerParams: finger parameters of the hand
+    :param result: recognition result
+    :return: display list with the found key points and the gesture (in the working scale coordinates)
+    """
+    annotations = annotateFingerParams(fingerParams)
+    annotations.add(FINGERS_LAYER, drawText, result.gesture)
+    return annotations
+
+
+def createPipelineGraph(metrics: Metrics = None, encoded: bool = False,
+                        segmentation: int = SEGMENTATION_CANNY) -> StageGraph:
+    """
+    Creates stage graph of the recognition - sources of the graph are "image" (BGR image as read by imread) or, for
+    the encoded graph, "imageBytes" (content of the image file) and "params" (ImageParam). Images higher than the
+    working height are downscaled first, outputs of the stages are in the working scale coordinates except for the
+    gesture result. Pixel-based parameters are multiplied by "paramScale" - they are tuned for WORKING_HEIGHT high
+    images. Recognition works on the grayscale image - the encoded graph decodes it directly (at a reduced
+    size if the working scale allows), color image is decoded only for the stages that draw on it ("prepared").
+    Segmentation method determines the stages the contours are found by - Canny edges ("cannyEdges", "blurredEdges",
+    "edges"), thresholding followed by selection of the largest connected component ("blurredGray", "foreground") or
+    skin color lookup ("skin", "foreground").
+    :param metrics: metrics registry the stage spans and key point counts are recorded in
+    :param encoded: create graph with the "imageBytes" source instead of "image"
+    :param segmentation: segmentation method - one of constants.SEGMENTATION_METHODS
+    :return: stage graph
+    """
+    graph = StageGraph(metrics)
+    if encoded:
+        graph.addStage("image", decodeImage, "imageBytes")
+        graph.addStage("imageShape", readEncodedImageShape, "imageBytes")
+        graph.addStage("grayImage", decodeGrayImage, "imageBytes", "scale")
+    else:
+        graph.addStage("imageShape", lambda image: image.shape[:2], "image")
+        graph.addStage("grayImage", lambda image: convertColorSpace(image, "grayscale"), "image")
+    graph.addStage("scale", findWorkingScale, "imageShape", "params", paramFields=SCALE_FIELDS)
+    graph.addStage("paramScale", findParamScale, "params", paramFields=SCALE_FIELDS)
+    graph.addStage("workingImage", resizeToScale, "image", "imageShape", "scale")
+    graph.addStage("workingGray", resizeToScale, "grayImage", "imageShape", "scale")
+    # both images are cropped to the rows found once (on the grayscale image) - contours found on "gray" must match
+    # "prepared" they are drawn on
+    graph.addStage("rotatedGray", rotateWorkingImage, "workingGray", "params", paramFields=ROTATION_FIELDS)
+    graph.addStage("cropRows", findRotationCrop, "rotatedGray", "params", paramFields=ROTATION_FIELDS)
+    graph.addStage("gray", cropImage, "rotatedGray", "cropRows", "params", paramFields=PREPARE_FIELDS)
+    graph.addStage("rotated", rotateWorkingImage, "workingImage", "params", paramFields=ROTATION_FIELDS)
+    graph.addStage("prepared", cropImage, "rotated", "cropRows", "params", paramFields=PREPARE_FIELDS)
+    if segmentation == SEGMENTATION_COMPONENTS:
+        graph.addStage("blurredGray", blurImage, "gray", "params", "paramScale", paramFields=BLUR_FIELDS)
+        graph.addStage("foreground", thresholdForeground, "blurredGray")
+        graph.addStage("contours", findForegroundContours, "foreground", "params", paramFields=CONTOUR_FIELDS)
+        graph.addStage("mask", createHandMask, "foreground", "contours", "params", "paramScale",
+                       paramFields=BLUR_FIELDS)
+    elif segmentation == SEGMENTATION_SKIN:
+        graph.addStage("skin", segmentSkin, "prepared")
+        graph.addStage("foreground", smoothMask, "skin", "params", "paramScale", paramFields=BLUR_FIELDS)
+        graph.addStage("contours", findEdgeContours, "foreground", "params", paramFields=CONTOUR_FIELDS)
+        graph.addStage("mask", createHandMask, "foreground", "contours", "params", "paramScale",
+                       paramFields=BLUR_FIELDS)
+    elif segmentation == SEGMENTATION_CANNY:
+        graph.addStage("cannyEdges", detectEdges, "gray", "params", paramFields=CANNY_FIELDS)
+        graph.addStage("blurredEdges", blurImage, "cannyEdges", "params", "paramScale", paramFields=BLUR_FIELDS)
+        graph.addStage("edges", closeEdges, "blurredEdges")
+        graph.addStage("contours", findEdgeContours, "edges", "params", paramFields=CONTOUR_FIELDS)
+        graph.addStage("mask", createHandMask, "edges", "contours", "params", "paramScale", paramFields=BLUR_FIELDS)
+    else:
+        raise InvalidArgumentTypeOrValueError(f"Unknown segmentation method: {segmentation}.")
+    graph.addStage("maxContour", findHandContour, "contours", "params", paramFields=HAND_CONTOUR_FIELDS)
+    graph.addStage("contourImage", drawContoursImage, "prepared", "contours")
+    graph.addStage("defects", findConvexityDefects, "maxContour")
+    graph.addStage("fingerParams", partial(findHandFingerParams, metrics=metrics), "maxContour", "params", "defects",
+                   "paramScale", paramFields=FINGER_FIELDS)
+    graph.addStage("gesture", recognizeGesture, "fingerParams", "params", "scale", "paramScale",
+                   paramFields=DECISION_FIELDS)
+    graph.addStage("annotations", annotateResult, "fingerParams", "gesture")
+    graph.addStage("annotatedImage", lambda image, annotations: annotations.render(image), "prepared", "annotations")
+    return graph
+
+
+class GesturePipeline:
+    """
+    Headless gesture recognition - takes an image and returns GestureResult, without any GUI, stdin or stdout usage.
+    Stages are evaluated lazily, so only the outputs that are requested (and the stages they depend on) are computed.
+    With a StageCache, contours and convexity defects of already seen image files (with the same edge detection
+    parameters) are read from the cache instead of being computed. With Metrics, stage spans and key point counts
+    are recorded. Stage graph of every segmentation method is created on its first use.
+    """
+
+    def __init__(self, cache: StageCache = None, metrics: Metrics = None):
+        self.graphs = {}
+        self.cache = cache
+        self.metrics = metrics
+
+    def getGraph(self, params: ImageParam = DEFAULT_PARAMS, encoded: bool = False) -> StageGraph:
+        """
+        :param params: image parameters (segmentation method)
+        :param encoded: graph with the "imageBytes" source instead of "image"
+        :return: stage graph of the segmentation method
+        """
+        if params.segmentation not in SEGMENTATION_METHODS:
+            raise InvalidArgumentTypeOrValueError(f"Unknown segmentation method: {params.segmentation}.")
+        key = (int(params.segmentation), encoded)
+        graph = self.graphs.get(key)
+        if graph is None:
+            graph = self.graphs[key] = createPipelineGraph(self.metrics, encoded, key[0])
+        return graph
+
+    def evaluate(self, image: ndarray, params: ImageParam = DEFAULT_PARAMS, **stages) -> StageEvaluation:
+        """
+        Creates lazy evaluation of the pipeline for the image - request outputs by stage name, e.g.
+        evaluation["gesture"] or evaluation["mask"], evaluation.profile shows which stages ran.
+        :param image: BGR image (as read by imread)
+        :param params: image parameters
+        :param stages: outputs of the stages known in advance, they are not computed - e.g. scale and grayImage of
+        a region of an already processed frame
+        :return: lazy stage evaluation
+        """
+        if image is None or not isinstance(image, ndarray) or image.dtype != uint8:
+            raise InvalidArgumentTypeOrValueError("Image must be a uint8 numpy array.")
+        if not isinstance(params, ImageParam):
+            raise InvalidArgumentTypeOrValueError("Image parameters must be ImageParam.")
+        return self.getGraph(params).evaluate(image=image, params=params, **stages)
+
+    def evaluateBytes(self, imageBytes: bytes, params: ImageParam = DEFAULT_PARAMS) -> StageEvaluation:
+        """
+        Creates lazy evaluation of the pipeline for the encoded image - the image is decoded only if a stage that
+        needs the pixels has to run (directly to grayscale, color only for drawing), cache entries are keyed by hash
+        of the image bytes.
+        :param imageBytes: content of the image file
+        :param params: image parameters
+        :return: lazy stage evaluation
+        """
+        if not isinstance(imageBytes, bytes):
+            raise InvalidArgumentTypeOrValueError("Image content must be bytes.")
+        if not isinstance(params, ImageParam):
+            raise InvalidArgumentTypeOrValueError("Image parameters must be ImageParam.")
+        return self.getGraph(params, encoded=True).evaluate(self.cache, imageBytes=imageBytes, params=params)
+
+    def evaluateFile(self, path: str, params: ImageParam = DEFAULT_PARAMS) -> StageEvaluation:
+        """
+        Creates lazy evaluation of the pipeline for the image file.
+        :param path: image path
+        :param params: image parameters
+        :return: lazy stage evaluation
+        """
+        try:
+            with open(path, "rb") as file:
+                imageBytes = file.read()
+        except OSError:
+            raise ImageNotFoundError(f"Image file {path} cannot be found.")
+        return self.evaluateBytes(imageBytes, params)
+
+    def predict(self, image: ndarray, params: ImageParam = DEFAULT_PARAMS) -> GestureResult:
+        """
+        Recognizes gesture on the image.
+        :param image: BGR image (as read by imread)
+        :param params: image parameters
+        :return: recognition result
+        """
+        return self.evaluate(image, params)["gesture"]
@@ -1,110 +1,148 @@
+from typing import NamedTuple
+
+from annotations import DisplayList
 from hand_finger_detection import *
 from img_draw import *
 from img_contours import *
-from img_proc import cloneImage
 from cv2 import imshow, waitKey
 
-from math_util import calculateLineSlope
+from image_param import ImageParam, DEFAULT_PARAMS
 from io_utils import waitUntilEnter
-
-
-def findAndDrawFingerParams(maxContour, image):
-    possibleFingersImage = cloneImage(image)
-    keyPointsImage = cloneImage(image)
-    convexHullImage = cloneImage(image)
-    fingersImage = cloneImage(image)
-
-    print("[1] Find defect points......", end=" ")
-    defects = findConvexityDefects(maxContour)
-    print("DONE")
-    # print(f"{len(defects)} points found")
-    print("[2] Get points from defects.......", end=" ")
-    points = getConvexPoints(maxContour, defects)
-    print("DONE")
-    print(f"{len(points)} points found.")
-    print("[3] Find root point.......", end=" ")
+from metrics import Metrics, METRICS
+
+# annotation layers - one window each in the interactive mode
+KEY_POINTS_LAYER = "Key points"
+POSSIBLE_FINGERS_LAYER = "Possible fingers"
+CONVEX_HULL_LAYER = "Convex hull"
+FINGERS_LAYER = "Fingers"
+
+
+class FingerParams(NamedTuple):
+    defects: object
+    points: list
+    rootPoint: tuple
+    mergedPoints: list
+    distances: dict
+    farthestPoint: tuple
+    enclosingCircle: tuple
+    possibleFingers: list
+    fingers: list
+    defectPoints: list
+    valleys: list
+
+
+def findFingerParams(maxContour, params: ImageParam = DEFAULT_PARAMS, defects=None):
+    """
+    Finds key points of the hand (root point, fingers and finger valleys) - no drawing, printing or waiting for input.
+    :param maxContour: contour of the hand
+    :param params: image parameters
+    :param defects: convexity defects of the contour (found if not given)
+    :return: FingerParams with found fingers, root point, root-to-finger distances, valleys and intermediate points
+    """
+    if defects is None:
+        defects = findConvexityDefects(maxContour)
+    geometry = getDefectGeometry(maxContour, defects)
+    points = [tuple(point) for point in geometry.start.tolist()]
     rootPoint = findPalmRoot(points)
-    print("DONE")
-    print(f"Coordinates of the palm root point:{rootPoint}")
-    print("[4] Finding close points.....", end=" ")
-    closePoints = findClosePoints(points)
-    print("DONE")
-    print("[5] Merging close points.....", end=" ")
-    mergedPoints = mergeClosePoints(closePoints)
-    print("DONE")
-    print(f"Merged points:{mergedPoints}")
-    drawPoints(keyPointsImage, mergedPoints, color=(0, 255, 255))
-
-    # drawCircle(keyPointsImage, rootPoint, 4, (255, 255, 255), -1)
-
-    print("[6] Calculate distances between root point and other points........", end=" ")
-    distances, farthestPoint = calculateRootToPointsDistances(rootPoint, mergedPoints)
-    print("DONE")
-    print(f"Coordinates of the farthest point:{farthestPoint}")
-
-    for point in distances:
-        drawLine(keyPointsImage, point, rootPoint, (0, 255, 0))
-    drawPoints(keyPointsImage, [farthestPoint], color=(128, 128, 255))
-    c, radius = findMinEnclosingCircle(maxContour)
-    drawCircle(keyPointsImage, c, radius, color=(255, 0, 255))
-    drawPoint(keyPointsImage, rootPoint, color=(255, 255, 255))
-
-    fingers = mergedPoints
-
-    possibleFingers = []
-    print("[7] Remove low-positioned points (if any)........", end=" ")
-    angleOffset = ImageParam.angleOffset
-    cutoffAngles = ImageParam.cutoffAngles
-    for point in fingers:
-        angle = calculateLineSlope(rootPoint, point)
-        angle += angleOffset
-        if cutoffAngles[0] <= angle <= cutoffAngles[1]:
-            continue
-        possibleFingers.append(point)
-    print("DONE")
-    # possibleFingers = rotateContourPoints(possibleFingers)
-    print(f"Fingers points afer removal operation: {possibleFingers}")
-    print("[8] Remove collinear points........", end=" ")
-    possibleFingers = removeCollinearFingers(possibleFingers)
-    drawPoints(possibleFingersImage, possibleFingers, color=(0, 0, 255))
-    print("DONE")
-
-    # remove points from distance dict
-    distancesCopy = distances.copy()
-    for finger in distancesCopy:
-        # TODO: should be optimized
-        if finger not in possibleFingers:
-            distances.pop(finger)
-    # print(len(fings))
-    foundFingers = possibleFingers
-    print("[9] Remove false fingers (closest to root point)........", end=" ")
-    if len(distances) > 5:
-        foundFingers = removeFalseFingers(distances)
-    print("DONE")
-
-    drawCircle(convexHullImage, farthestPoint, 5, (0, 255, 255), -1)
-    drawPoints(fingersImage, foundFingers, color=(255, 0, 0))
-
-    defectPoints = getConvexPoints(maxContour, defects, "all")
-    print("[10] Find finger valleys........", end=" ")
-    valleys = findFingerValleys(defectPoints)
-    print("DONE")
-    print(f"{len(valleys)} finger valleys found - {valleys}")
-    drawConvexHull(convexHullImage, defectPoints)
-    if len(valleys) > 0:
-        point = valleys[0][2]
-        drawCircle(keyPointsImage, point, 4, (0, 0, 200), -1)
+    mergedArray = mergeClosePointsArray(geometry.start, findClosePointsArray(geometry.start, params))
+    mergedPoints = [tuple(point) for point in mergedArray.tolist()]
+    rootDistances, farthestIndex = calculateRootToPointsDistancesArray(rootPoint, mergedArray)
+    farthestPoint = mergedPoints[farthestIndex] if farthestIndex is not None else None
+    enclosingCircle = findMinEnclosingCircle(maxContour)
+
+    candidates = FingerCandidates(mergedPoints, rootDistances.tolist(), rootPoint)
+    candidates.removeCutoffAngles(params)
+    candidates.removeCollinear(params)
+    possibleFingers = candidates.fingers
+    fingerDistances = candidates.fingerDistances
+    candidates.keepFarthest(5)
+    foundFingers = candidates.fingers
+
+    defectPoints = list(zip(*(map(tuple, points.tolist()) for points in (geometry.start, geometry.end, geometry.far))))
+    valleyMask = findFingerValleysMask(geometry.start, geometry.end, geometry.far)
+    valleys = [defectPoints[i] for i in np.flatnonzero(valleyMask)]
+    return FingerParams(defects, points, rootPoint, mergedPoints, fingerDistances, farthestPoint, enclosingCircle,
+                        possibleFingers, foundFingers, defectPoints, valleys)
+
+
+def countKeyPoints(fingerParams: FingerParams) -> dict:
+    """
+    :param fingerParams: finger parameters of the hand
+    :return: map of the key point names and their counts (defects, merged points, valleys, removed fingers)
+    """
+    return {
+        "defects": len(fingerParams.points),
+        "mergedPoints": len(fingerParams.mergedPoints),
+        "valleys": len(fingerParams.valleys),
+        "removedFingers": len(fingerParams.mergedPoints) - len(fingerParams.fingers),
+    }
+
+
+def recordFingerMetrics(fingerParams: FingerParams, metrics: Metrics = METRICS) -> None:
+    """
+    Records counts of the found key points - totals as counters and per-image values as histograms.
+    :param fingerParams: finger parameters of the hand
+    :param metrics: metrics registry
+    """
+    recordKeyPointCounts(countKeyPoints(fingerParams), metrics)
+
+
+def recordKeyPointCounts(counts: dict, metrics: Metrics = METRICS) -> None:
+    """
+    Records key point counts of a hand (e.g. counted in a worker process) - totals as counters and per-image values
+    as histograms.
+    :param counts: map of the key point names and their counts, as returned by countKeyPoints
+    :param metrics: metrics registry
+    """
+    metrics.increment("hands")
+    for name, count in counts.items():
+        metrics.increment(name, count)
+        metrics.observe(name, count)
+
+
+def annotateFingerParams(fingerParams: FingerParams, annotations: DisplayList = None) -> DisplayList:
+    """
+    Records drawing of the found key points - nothing is drawn until the display list is rendered.
+    :param fingerParams: finger parameters of the hand
+    :param annotations: display list the calls are added to (new one if not given)
+    :return: display list with the key points, possible fingers, convex hull and fingers layers
+    """
+    annotations = annotations if annotations is not None else DisplayList()
+    rootPoint = fingerParams.rootPoint
+    annotations.add(KEY_POINTS_LAYER, drawPoints, fingerParams.mergedPoints, color=(0, 255, 255))
+    # annotations.add(KEY_POINTS_LAYER, drawCircle, rootPoint, 4, (255, 255, 255), -1)
+    for point in fingerParams.mergedPoints:
+        annotations.add(KEY_POINTS_LAYER, drawLine, point, rootPoint, (0, 255, 0))
+    annotations.add(KEY_POINTS_LAYER, drawPoints, [fingerParams.farthestPoint], color=(128, 128, 255))
+    c, radius = fingerParams.enclosingCircle
+    annotations.add(KEY_POINTS_LAYER, drawCircle, c, radius, color=(255, 0, 255))
+    annotations.add(KEY_POINTS_LAYER, drawPoint, rootPoint, color=(255, 255, 255))
+
+    annotations.add(POSSIBLE_FINGERS_LAYER, drawPoints, fingerParams.possibleFingers, color=(0, 0, 255))
+    annotations.add(CONVEX_HULL_LAYER, drawCircle, fingerParams.farthestPoint, 5, (0, 255, 255), -1)
+    annotations.add(FINGERS_LAYER, drawPoints, fingerParams.fingers, color=(255, 0, 0))
+    annotations.add(CONVEX_HULL_LAYER, drawConvexHull, fingerParams.defectPoints)
+    if len(fingerParams.valleys) > 0:
+        point = fingerParams.valleys[0][2]
+        annotations.add(KEY_POINTS_LAYER, drawCircle, point, 4, (0, 0, 200), -1)
+    return annotations
+
+
+def findAndDrawFingerParams(maxContour, image, params: ImageParam = DEFAULT_PARAMS, metrics: Metrics = METRICS):
+    with metrics.span("fingerParams"):
+        fingerParams = findFingerParams(maxContour, params)
+    recordFingerMetrics(fingerParams, metrics)
+    annotations = annotateFingerParams(fingerParams)
+
     print("Press any key to show useful images with calculated and found parameters.")
     waitUntilEnter()
-    imshow("Convex hull", convexHullImage)
-    imshow("Key points", keyPointsImage)
-    imshow("Possible fingers", possibleFingersImage)
-    # imshow("Fingers", fingersImage)
-    return fingersImage, foundFingers, rootPoint, distances, valleys
+    for layer in (CONVEX_HULL_LAYER, KEY_POINTS_LAYER, POSSIBLE_FINGERS_LAYER):
+        imshow(layer, annotations.render(image, [layer]))
+    return annotations, fingerParams.fingers, fingerParams.rootPoint, fingerParams.distances, fingerParams.valleys
 
 
 # TODO: need to be refactored - optimize conditions above all
-def determineGesture(image, fingers, rootPoint, rootToPointsDistances, valleys):
+def determineGesture(image, fingers, rootPoint, rootToPointsDistances, valleys, params: ImageParam = DEFAULT_PARAMS):
     decisionCredibility = "uncertain"
     foundGesture = None
     maxDistance = max(rootToPointsDistances.values())
@@ -122,12 +160,12 @@ def determineGesture(image, fingers, rootPoint, rootToPointsDistances, valleys):
             b = distanceBetweenPoints(valleys[0][1], valleys[0][2])
             valley = valleys[0]
             # TODO: too complex condition - recode this
-            if ((abs(valley[0][1] - valley[1][1]) < ImageParam.valleyTopPointsHeightDiff) and
-                valley[2][1] - max(valley[0][1], valley[1][1]) > ImageParam.valleyDepthThreshold) or \
-                    (a >= ImageParam.valleySidesLengthFactor * b) or \
-                    sortedFingersByHeight[0][1] - sortedFingersByHeight[-1][0] > ImageParam.fingersHeightDiff \
-                    or (valley[2][1] - valley[0][1] > ImageParam.valleyDepthThreshold and
-                        valley[2][1] - valley[1][1]) > ImageParam.valleyDepthThreshold:
+            if ((abs(valley[0][1] - valley[1][1]) < params.valleyTopPointsHeightDiff) and
+                valley[2][1] - max(valley[0][1], valley[1][1]) > params.valleyDepthThreshold) or \
+                    (a >= params.valleySidesLengthFactor * b) or \
+                    sortedFingersByHeight[0][1] - sortedFingersByHeight[-1][0] > params.fingersHeightDiff \
+                    or (valley[2][1] - valley[0][1] > params.valleyDepthThreshold and
+                        valley[2][1] - valley[1][1]) > params.valleyDepthThreshold:
                 foundGesture = "scissors"
                 decisionCredibility = "certain"
             else:
@@ -144,17 +182,17 @@ def determineGesture(image, fingers, rootPoint, rootToPointsDistances, valleys):
 
             fingerLengths = [rootPoint[1] - finger[1] for finger in sortedFingersByHeight[:3]]
             if len(valleys) > 0:
-                if len(fingers) == 5 or (maxHeightFinger[1] - minHeightFinger[1] > ImageParam.fingersLengthDiff) and (
-                        maxDistance - minDistance > ImageParam.minMaxFingerDist):
+                if len(fingers) == 5 or (maxHeightFinger[1] - minHeightFinger[1] > params.fingersLengthDiff) and (
+                        maxDistance - minDistance > params.minMaxFingerDist):
                     foundGesture = "paper"
-                    if all([finger >= ImageParam.longestFingersHeightsThreshold for finger in fingerLengths]):
+                    if all([finger >= params.longestFingersHeightsThreshold for finger in fingerLengths]):
                         decisionCredibility = "certain"
                     else:
                         decisionCredibility = "uncertain - rock properties"
             else:
-                if (maxHeightFinger[1] - minHeightFinger[1] > ImageParam.fingersLengthDiff) and (
-                        maxDistance - minDistance > ImageParam.minMaxFingerDist) and \
-                        all([fl >= ImageParam.longestFingersHeightsThreshold for fl in fingerLengths]):
+                if (maxHeightFinger[1] - minHeightFinger[1] > params.fingersLengthDiff) and (
+                        maxDistance - minDistance > params.minMaxFingerDist) and \
+                        all([fl >= params.longestFingersHeightsThreshold for fl in fingerLengths]):
                     decisionCredibility = "uncertain - rock properties"
                     foundGesture = "paper"
                 else:
@@ -163,9 +201,9 @@ def determineGesture(image, fingers, rootPoint, rootToPointsDistances, valleys):
     return foundGesture, decisionCredibility
 
 
-def predictGesture(maxContour, image):
-    fingersImage, foundFingers, rootPoint, distances, valleys = findAndDrawFingerParams(maxContour, image)
-    gesture, decisionCredibility = determineGesture(fingersImage, foundFingers, rootPoint, distances, valleys)
+def predictGesture(maxContour, image, params: ImageParam = DEFAULT_PARAMS):
+    annotations, foundFingers, rootPoint, distances, valleys = findAndDrawFingerParams(maxContour, image, params)
+    gesture, decisionCredibility = determineGesture(None, foundFingers, rootPoint, distances, valleys, params)
     print(f"Gesture on the image: {gesture}. Decision credibility = {decisionCredibility}.")
-    drawText(fingersImage, gesture)
-    imshow("Fingers", fingersImage)
+    annotations.add(FINGERS_LAYER, drawText, gesture)
+    imshow(FINGERS_LAYER, annotations.render(image, [FINGERS_LAYER]))
@@ -1,14 +1,15 @@
 from math_util import distanceBetweenPoints, calculateAngle, calculateLineSlope
 from numpy import mean, median, pi
-from image_param import ImageParam
+import numpy as np
+from image_param import ImageParam, DEFAULT_PARAMS
 
 
-def findClosePoints(points):
+def findClosePoints(points, params: ImageParam = DEFAULT_PARAMS):
     closePoints = {}
     pointNo = 0
     batch = []
-    distThreshold = ImageParam.consecutivePointsDistThreshold
-    coordsOffset = ImageParam.consecutivePointsCoordOffset
+    distThreshold = params.consecutivePointsDistThreshold
+    coordsOffset = params.consecutivePointsCoordOffset
     for i in range(len(points) - 1):
         dist = distanceBetweenPoints(points[i], points[i + 1])
         x1, y1 = points[i]
@@ -26,6 +27,50 @@ def findClosePoints(points):
     return closePoints
 
 
+def findClosePointsArray(points: np.ndarray, params: ImageParam = DEFAULT_PARAMS) -> np.ndarray:
+    """
+    Array version of findClosePoints - splits consecutive points into clusters of close points.
+    :param points: (N, 2) array of points
+    :param params: image parameters (consecutive points thresholds)
+    :return: (N,) array with cluster number of every point, -1 for the trailing points that findClosePoints omits
+    """
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    clusterIds = np.full(len(points), -1)
+    if len(points) < 2:
+        return clusterIds
+    diff = points[:-1] - points[1:]
+    dist = np.sqrt((diff ** 2).sum(axis=1))
+    close = (dist < params.consecutivePointsDistThreshold) | \
+            (np.abs(diff) <= params.consecutivePointsCoordOffset).all(axis=1)
+    # cluster ends at every point that is not close to the next one
+    ends = np.flatnonzero(~close)
+    if ends.size:
+        clusterIds[:ends[-1] + 1] = np.searchsorted(ends, np.arange(ends[-1] + 1))
+    return clusterIds
+
+
+def mergeClosePointsArray(points: np.ndarray, clusterIds: np.ndarray) -> np.ndarray:
+    """
+    Array version of mergeClosePoints - replaces every cluster with its (coordinate-wise) median point.
+    :param points: (N, 2) array of points
+    :param clusterIds: cluster numbers returned by findClosePointsArray
+    :return: (K, 2) array of merged points, one per cluster
+    """
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    inCluster = clusterIds >= 0
+    points, clusterIds = points[inCluster], clusterIds[inCluster]
+    if clusterIds.size == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    counts = np.bincount(clusterIds)
+    starts = np.cumsum(counts) - counts
+    lower, upper = starts + (counts - 1) // 2, starts + counts // 2
+    merged = np.empty((len(counts), 2), dtype=np.int64)
+    for axis in range(2):
+        values = points[np.lexsort((points[:, axis], clusterIds)), axis]
+        merged[:, axis] = ((values[lower] + values[upper]) / 2).astype(np.int64)
+    return merged
+
+
 def mergeClosePoints(closePoints):
     mergedPoints = []
     for pointNo, clPoints in closePoints.items():
@@ -65,6 +110,21 @@ def calculateRootToPointsDistances(rootPoint, points):
     return pointsDist, farthestPoint
 
 
+def calculateRootToPointsDistancesArray(rootPoint, points: np.ndarray) -> tuple:
+    """
+    Array version of calculateRootToPointsDistances.
+    :param rootPoint: root point of the palm
+    :param points: (N, 2) array of points
+    :return: (N,) array of distances from the root point and index of the farthest point (last one in case of
+    ties, None if there are no points)
+    """
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    distances = np.sqrt(((points - np.asarray(rootPoint, dtype=np.int64)) ** 2).sum(axis=1))
+    if distances.size == 0:
+        return distances, None
+    return distances, len(distances) - 1 - int(np.argmax(distances[::-1]))
+
+
 def findFingerValleys(defectPoints):
     valleys = []
     for defect in defectPoints:
@@ -79,6 +139,38 @@ def findFingerValleys(defectPoints):
     return valleys
 
 
+def calculateDefectAngles(start: np.ndarray, end: np.ndarray, far: np.ndarray) -> np.ndarray:
+    """
+    Array version of the angle calculation in findFingerValleys - angle (in radians) at the far point of every
+    defect triangle, NaN for degenerate triangles.
+    :param start: (N, 2) array of defect start points
+    :param end: (N, 2) array of defect end points
+    :param far: (N, 2) array of defect far points
+    :return: (N,) array of angles
+    """
+    start, end, far = (np.asarray(points, dtype=np.int64).reshape(-1, 2) for points in (start, end, far))
+    a = np.sqrt(((start - end) ** 2).sum(axis=1))
+    b = np.sqrt(((start - far) ** 2).sum(axis=1))
+    c = np.sqrt(((end - far) ** 2).sum(axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cosines = (b ** 2 + c ** 2 - a ** 2) / (2 * b * c)  # cosine theorem
+    cosines[(b == 0) | (c == 0)] = np.nan
+    return np.arccos(np.clip(cosines, -1.0, 1.0))
+
+
+def findFingerValleysMask(start: np.ndarray, end: np.ndarray, far: np.ndarray) -> np.ndarray:
+    """
+    Array version of findFingerValleys - defect is a valley if its angle is at most 90 degrees and both its start
+    and end points are above the far point.
+    :param start: (N, 2) array of defect start points
+    :param end: (N, 2) array of defect end points
+    :param far: (N, 2) array of defect far points
+    :return: (N,) boolean mask of valleys
+    """
+    angles = calculateDefectAngles(start, end, far)
+    return (angles <= pi / 2) & (start[:, 1] < far[:, 1]) & (end[:, 1] < far[:, 1])
+
+
 def rotateContourPoints(points):
     for i in range(len(points) - 1):
         if points[i + 1][0] > points[i][0]:
@@ -88,12 +180,12 @@ def rotateContourPoints(points):
     return points[i + 1:] + points[:i + 1]
 
 
-def removeCollinearFingers(fingers):
+def removeCollinearFingers(fingers, params: ImageParam = DEFAULT_PARAMS):
     fingerSet = set(fingers)
-    angleOffset = ImageParam.angleOffset
+    angleOffset = params.angleOffset
     for i in range(len(fingers) - 1):
         angle = (calculateLineSlope(fingers[i], fingers[i + 1]) + angleOffset) % 180
-        angleBounds = ImageParam.angleBounds
+        angleBounds = params.angleBounds
         if angleBounds[0] <= angle <= angleBounds[1]:
             if fingers[i][1] <= fingers[i + 1][1]:
                 fingerToRemove = fingers[i+1]
@@ -109,3 +201,84 @@ def removeFalseFingers(distances, fingersNo=5):
     for finger, dist in sorted(distances.items(), key=lambda x: x[1], reverse=True):
         fingers.append(finger)
     return fingers[:fingersNo]
+
+
+class FingerCandidates:
+    """
+    Finger candidates (merged key points of the hand contour) as parallel lists in contour order with a keep flag per
+    point - the finger filters (cutoff angles, collinear fingers, the farthest fingers) only clear the flags instead of
+    rebuilding lists, sets and dicts of the points. Plain lists are used as a hand has only about ten candidates, too
+    few for NumPy calls to pay off.
+    """
+    __slots__ = ("points", "distances", "slopes", "keep")
+
+    def __init__(self, points: list, distances: list, rootPoint: tuple):
+        """
+        :param points: list of merged points (tuples) in contour order
+        :param distances: list of root-to-point distances
+        :param rootPoint: root point of the hand
+        """
+        self.points = points
+        self.distances = distances
+        self.slopes = [calculateLineSlope(rootPoint, point) for point in points]
+        self.keep = [True] * len(points)
+
+    def keptIndices(self) -> list:
+        return [i for i, keep in enumerate(self.keep) if keep]
+
+    def removeCutoffAngles(self, params: ImageParam = DEFAULT_PARAMS) -> None:
+        """
+        Removes points whose slope from the root point (shifted by angleOffset) is within cutoffAngles.
+        :param params: image parameters
+        """
+        angleOffset = params.angleOffset
+        low, high = params.cutoffAngles
+        for i, slope in enumerate(self.slopes):
+            if low <= slope + angleOffset <= high:
+                self.keep[i] = False
+
+    def removeCollinear(self, params: ImageParam = DEFAULT_PARAMS) -> None:
+        """
+        Flag version of removeCollinearFingers - of every two consecutive kept points with slope (shifted by
+        angleOffset) within angleBounds the lower one is removed, together with its duplicates. Duplicate points are
+        kept only once (first occurrence), the contour order is preserved.
+        :param params: image parameters
+        """
+        indices = self.keptIndices()
+        points = self.points
+        angleOffset = params.angleOffset
+        low, high = params.angleBounds
+        removed = set()
+        for i, j in zip(indices, indices[1:]):
+            if low <= (calculateLineSlope(points[i], points[j]) + angleOffset) % 180 <= high:
+                removed.add(points[j] if points[i][1] <= points[j][1] else points[i])
+        seen = set()
+        for i in indices:
+            if points[i] in removed or points[i] in seen:
+                self.keep[i] = False
+            seen.add(points[i])
+
+    def keepFarthest(self, count: int = 5) -> None:
+        """
+        Flag version of removeFalseFingers - keeps only the given number of points farthest from the root point (the
+        earlier point of equally distant ones).
+        :param count: number of kept points
+        """
+        indices = self.keptIndices()
+        if len(indices) > count:
+            for i in sorted(indices, key=lambda index: self.distances[index], reverse=True)[count:]:
+                self.keep[i] = False
+
+    @property
+    def fingers(self) -> list:
+        """
+        :return: list of the kept points in contour order
+        """
+        return [point for point, keep in zip(self.points, self.keep) if keep]
+
+    @property
+    def fingerDistances(self) -> dict:
+        """
+        :return: map of the kept points to their root distances in contour order
+        """
+        return {point: distance for point, distance, keep in zip(self.points, self.distances, self.keep) if keep}
@@ -0,0 +1,135 @@
+from typing import NamedTuple
+
+from numpy import ndarray
+
+from constants import ROI_PADDING, ROI_MIN_PADDING
+from gesture_pipeline import GesturePipeline, GestureResult, scaleResult
+from image_param import ImageParam, DEFAULT_PARAMS
+from img_contours import findBoundingRect
+from stage_graph import StageEvaluation
+
+
+class TrackedResult(NamedTuple):
+    result: GestureResult
+    roi: tuple  # processed region (x, y, width, height) of the prepared frame
+    tracked: bool  # True if only the region of the hand from the previous frame was processed
+
+
+def padRegion(rect: tuple, shape: tuple, padding: float = ROI_PADDING, minPadding: int = ROI_MIN_PADDING) -> tuple:
+    """
+    :param rect: (x, y, width, height) rectangle
+    :param shape: shape of the frame
+    :param padding: padding relative to the larger side of the rectangle
+    :param minPadding: minimum padding in pixels
+    :return: padded rectangle clipped to the frame
+    """
+    x, y, w, h = rect
+    pad = max(minPadding, int(padding * max(w, h)))
+    x0, y0 = max(0, x - pad), max(0, y - pad)
+    x1, y1 = min(shape[1], x + w + pad), min(shape[0], y + h + pad)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def isInsideRegion(rect: tuple, region: tuple, shape: tuple) -> bool:
+    """
+    :param rect: (x, y, width, height) rectangle in the region coordinates
+    :param region: (x, y, width, height) region of the frame
+    :param shape: shape of the frame
+    :return: True if the rectangle does not touch the region borders (borders that are frame borders excluded)
+    """
+    x, y, w, h = rect
+    rx, ry, rw, rh = region
+    return (x > 0 or rx == 0) and (y > 0 or ry == 0) and (x + w < rw or rx + rw == shape[1]) and \
+        (y + h < rh or ry + rh == shape[0])
+
+
+def offsetResult(result: GestureResult, dx: int, dy: int) -> GestureResult:
+    """
+    :param result: recognition result in the region coordinates
+    :param dx: x coordinate of the region
+    :param dy: y coordinate of the region
+    :return: recognition result in the frame coordinates
+    """
+    def offset(point):
+        return point[0] + dx, point[1] + dy
+
+    return result._replace(fingers=[offset(finger) for finger in result.fingers],
+                           valleys=[tuple(offset(point) for point in valley) for valley in result.valleys],
+                           rootPoint=offset(result.rootPoint))
+
+
+def scaleRegion(region: tuple, factor: float) -> tuple:
+    """
+    :param region: (x, y, width, height) region
+    :param factor: factor the coordinates are multiplied by
+    :return: rescaled region
+    """
+    if factor == 1:
+        return region
+    return tuple(int(round(value * factor)) for value in region)
+
+
+class HandTracker:
+    """
+    Gesture recognition on consecutive frames that processes only the (padded) bounding box of the hand found in the
+    previous frame. Falls back to the whole frame when the hand is not found in the region or when it touches the
+    region borders (hand moved out of it). The frame is rotated, cropped and resized to the working scale as in
+    GesturePipeline and the region is cut out of the resulting images, so it is processed with the same working scale
+    and pixel thresholds as the whole frame. Coordinates of the results are in the prepared (rotated and cropped)
+    frame space, as in GesturePipeline.
+    """
+
+    def __init__(self, pipeline: GesturePipeline = None, padding: float = ROI_PADDING,
+                 minPadding: int = ROI_MIN_PADDING):
+        self.pipeline = pipeline or GesturePipeline()
+        self.padding = padding
+        self.minPadding = minPadding
+        self.roi = None  # region of the prepared frame in the working scale coordinates
+
+    def reset(self) -> None:
+        self.roi = None
+
+    def recognizeRegion(self, frame: StageEvaluation, region: tuple, params: ImageParam) -> tuple:
+        """
+        :param frame: evaluation of the whole frame (its prepared images are used)
+        :param region: (x, y, width, height) processed region in the working scale coordinates
+        :param params: image parameters (without rotation and cropping)
+        :return: (recognition result in the frame coordinates, bounding box of the hand in the working scale
+        coordinates)
+        """
+        x, y, w, h = region
+        prepared, gray = frame["prepared"], frame["gray"]
+        # region is already in the working scale - it is not resized again
+        evaluation = self.pipeline.evaluate(prepared[y:y + h, x:x + w], params, grayImage=gray[y:y + h, x:x + w],
+                                            scale=1.0)
+        result = evaluation["gesture"]
+        bx, by, bw, bh = findBoundingRect(evaluation["maxContour"])
+        if not isInsideRegion((bx, by, bw, bh), region, gray.shape):
+            return None, None
+        return scaleResult(offsetResult(result, x, y), 1 / frame["scale"]), (bx + x, by + y, bw, bh)
+
+    def predict(self, frame: ndarray, params: ImageParam = DEFAULT_PARAMS) -> TrackedResult:
+        """
+        Recognizes gesture on the frame.
+        :param frame: BGR frame
+        :param params: image parameters
+        :return: recognition result with the processed region (in the prepared frame coordinates)
+        """
+        evaluation = self.pipeline.evaluate(frame, params)
+        scale = evaluation["scale"]
+        shape = evaluation["gray"].shape
+        if self.roi is not None:
+            region = self.roi
+            try:
+                result, box = self.recognizeRegion(evaluation, region,
+                                                   params.setParams(rotationAngle=0, takeUpperHalf=False))
+            except Exception:
+                result = None
+            if result is not None:
+                self.roi = padRegion(box, shape, self.padding, self.minPadding)
+                return TrackedResult(result, scaleRegion(region, 1 / scale), True)
+        # hand lost - search the whole frame
+        self.roi = None
+        result = evaluation["gesture"]
+        self.roi = padRegion(findBoundingRect(evaluation["maxContour"]), shape, self.padding, self.minPadding)
+        return TrackedResult(result, scaleRegion((0, 0, shape[1], shape[0]), 1 / scale), False)
@@ -0,0 +1,104 @@
+from struct import unpack_from
+
+from cv2 import imdecode, IMREAD_COLOR, IMREAD_GRAYSCALE, IMREAD_REDUCED_GRAYSCALE_2, IMREAD_REDUCED_GRAYSCALE_4, \
+    IMREAD_REDUCED_GRAYSCALE_8
+from numpy import ndarray, uint8, frombuffer
+
+from exceptions import ImageNotFoundError
+
+# grayscale decoding flags by reduction factor - JPEG is decoded directly at the reduced size
+REDUCED_GRAYSCALE = {1: IMREAD_GRAYSCALE, 2: IMREAD_REDUCED_GRAYSCALE_2, 4: IMREAD_REDUCED_GRAYSCALE_4,
+                     8: IMREAD_REDUCED_GRAYSCALE_8}
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers (all except DHT, JPG and DAC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+def readExifOrientation(exif: bytes) -> int:
+    """
+    :param exif: content of the EXIF segment (TIFF header and IFDs)
+    :return: value of the orientation tag (1 if not present or invalid)
+    """
+    if len(exif) < 8 or exif[:2] not in (b"II", b"MM"):
+        return 1
+    order = "<" if exif[:2] == b"II" else ">"
+    offset = unpack_from(order + "I", exif, 4)[0]
+    if offset + 2 > len(exif):
+        return 1
+    entries = unpack_from(order + "H", exif, offset)[0]
+    for i in range(entries):
+        entryOffset = offset + 2 + 12 * i
+        if entryOffset + 12 > len(exif):
+            break
+        tag, _, _, value = unpack_from(order + "HHIH", exif, entryOffset)
+        if tag == EXIF_ORIENTATION_TAG:
+            return value
+    return 1
+
+
+def readImageShape(data: bytes) -> tuple:
+    """
+    Reads size of the JPEG or PNG image from its header, without decoding. Width and height are swapped for JPEG
+    images with EXIF orientation that rotates the image by 90 degrees (decoding applies the orientation).
+    :param data: content of the image file
+    :return: (height, width) of the decoded image or None if the format is not supported
+    """
+    if data[:8] == PNG_SIGNATURE and data[12:16] == b"IHDR":
+        width, height = unpack_from(">II", data, 16)
+        return height, width
+    if data[:2] != b"\xff\xd8":
+        return None
+    i, orientation = 2, 1
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without length
+            i += 2
+            continue
+        length = unpack_from(">H", data, i + 2)[0]
+        if marker == 0xE1 and data[i + 4:i + 10] == b"Exif\x00\x00":
+            orientation = readExifOrientation(data[i + 10:i + 2 + length])
+        elif marker in JPEG_SOF_MARKERS:
+            if i + 9 > len(data):
+                return None
+            height, width = unpack_from(">HH", data, i + 5)
+            return (width, height) if 5 <= orientation <= 8 else (height, width)
+        i += 2 + length
+    return None
+
+
+def decodeImage(data: bytes) -> ndarray:
+    """
+    :param data: content of the image file
+    :return: decoded BGR image
+    """
+    image = imdecode(frombuffer(data, uint8), IMREAD_COLOR)
+    if image is None:
+        raise ImageNotFoundError("Image cannot be decoded.")
+    return image
+
+
+def reductionFactor(scale: float) -> int:
+    """
+    :param scale: factor the image will be resized by
+    :return: largest decoding reduction factor (1, 2, 4 or 8) that does not go below the given scale
+    """
+    return max(factor for factor in REDUCED_GRAYSCALE if factor * scale <= 1)
+
+
+def decodeGrayImage(data: bytes, scale: float = 1.0) -> ndarray:
+    """
+    Decodes the image directly to grayscale - at a reduced size if the image will be downscaled anyway.
+    :param data: content of the image file
+    :param scale: factor the image will be resized by
+    :return: decoded grayscale image (at most reductionFactor(scale) times smaller)
+    """
+    image = imdecode(frombuffer(data, uint8), REDUCED_GRAYSCALE[reductionFactor(scale)])
+    if image is None:
+        raise ImageNotFoundError("Image cannot be decoded.")
+    return image
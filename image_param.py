@@ -1,33 +1,93 @@
-class ImageParam:
+from typing import NamedTuple
+
+from cv2 import CHAIN_APPROX_NONE
+
+from constants import BLUR, CANNY_THRESH_1, CANNY_THRESH_2, SEGMENTATION_CANNY
+
+
+class ImageParam(NamedTuple):
+    """
+    Immutable (and hashable) set of recognition parameters, passed explicitly through the whole pipeline.
+    Use setParams to get a copy with some of the parameters changed.
+    """
     # angle params
-    angleBounds = (75, 105)  # TODO: lower-upper validation
-    angleOffset = 0
-    cutoffAngles = (-15, 15)  # TODO: lower-upper validation
-    rotationAngle = 0
+    angleBounds: tuple = (75, 105)  # TODO: lower-upper validation
+    angleOffset: float = 0
+    cutoffAngles: tuple = (-15, 15)  # TODO: lower-upper validation
+    rotationAngle: float = 0
 
     # flags
-    takeUpperHalf = False
+    takeUpperHalf: bool = False
+
+    # segmentation method - one of constants.SEGMENTATION_METHODS
+    segmentation: int = SEGMENTATION_CANNY
+
+    # edge detection params
+    cannyThreshold1: int = CANNY_THRESH_1
+    cannyThreshold2: int = CANNY_THRESH_2
+    blurSize: int = BLUR
+
+    # contour params - approximation method of findContours (CHAIN_APPROX_NONE or CHAIN_APPROX_SIMPLE) and tolerance
+    # of the hand contour simplification relative to its perimeter (0 - not simplified)
+    contourApproximation: int = CHAIN_APPROX_NONE
+    contourTolerance: float = 0
 
     # dist params
-    consecutivePointsDistThreshold = 30.0
+    consecutivePointsDistThreshold: float = 30.0
 
     # coordinates offsets
-    consecutivePointsCoordOffset = 5.0
+    consecutivePointsCoordOffset: float = 5.0
 
     # valley params
-    valleyTopPointsHeightDiff = 50
-    valleyDepthThreshold = 70
-    valleySidesLengthFactor = 1.2
+    valleyTopPointsHeightDiff: float = 50
+    valleyDepthThreshold: float = 70
+    valleySidesLengthFactor: float = 1.2
 
     # finger params
-    fingersHeightDiff = 100
-    fingersLengthDiff = 140
-    minMaxFingerDist = 100
-    longestFingersHeightsThreshold = 280
-
-    @staticmethod
-    def setParams(**params):
-        for key, value in params.items():
-            if hasattr(ImageParam, key):
-                ImageParam.key = value
-                setattr(ImageParam, key, value)
+    fingersHeightDiff: float = 100
+    fingersLengthDiff: float = 140
+    minMaxFingerDist: float = 100
+    longestFingersHeightsThreshold: float = 280
+
+    # images higher than this are downscaled to it and the pixel-based params are rescaled (0 - no downscaling)
+    workingHeight: int = 0
+
+    def setParams(self, **params) -> "ImageParam":
+        """
+        Creates copy of the parameters with the given values changed - unknown parameter names are ignored.
+        :param params: parameter names and new values
+        :return: new parameters
+        """
+        return self._replace(**{key: tuple(value) if isinstance(value, list) else value
+                                for key, value in params.items() if key in self._fields})
+
+    def scaled(self, scale: float) -> "ImageParam":
+        """
+        Creates copy of the parameters for the image resized by the given factor - pixel-based thresholds are
+        multiplied by the factor, blur kernel size is rounded to an odd number.
+        :param scale: resize factor
+        :return: rescaled parameters
+        """
+        if scale == 1:
+            return self
+        values = {field: getattr(self, field) * scale for field in PIXEL_FIELDS}
+        values["blurSize"] = scaleKernelSize(self.blurSize, scale)
+        return self._replace(**values)
+
+
+# parameters given in pixels (of the image the thresholds are tuned for)
+PIXEL_FIELDS = ("consecutivePointsDistThreshold", "consecutivePointsCoordOffset", "valleyTopPointsHeightDiff",
+                "valleyDepthThreshold", "fingersHeightDiff", "fingersLengthDiff", "minMaxFingerDist",
+                "longestFingersHeightsThreshold")
+
+
+def scaleKernelSize(size: int, scale: float) -> int:
+    """
+    :param size: odd kernel size
+    :param scale: resize factor of the image
+    :return: odd kernel size for the resized image
+    """
+    return max(1, int(round(size * scale)) | 1)
+
+
+DEFAULT_PARAMS = ImageParam()
@@ -1,5 +1,9 @@
-from cv2 import findContours, contourArea, minEnclosingCircle, moments, RETR_LIST, RETR_TREE, RETR_CCOMP, RETR_EXTERNAL, \
-    CHAIN_APPROX_NONE, CHAIN_APPROX_SIMPLE, convexHull, convexityDefects, fillConvexPoly
+from cv2 import findContours, contourArea, minEnclosingCircle, moments, RETR_LIST, RETR_TREE, RETR_CCOMP, \
+    RETR_EXTERNAL, CHAIN_APPROX_NONE, CHAIN_APPROX_SIMPLE, convexHull, convexityDefects, fillConvexPoly, boundingRect, \
+    approxPolyDP, arcLength
+from typing import NamedTuple
+
+import numpy as np
 from numpy import ndarray
 
 from img_draw import drawPoint, drawLine
@@ -32,6 +36,18 @@ def findMaxContour(contours: list) -> ndarray:
     return max(contours, key=lambda c: contourArea(c))
 
 
+def simplifyContour(contour: ndarray, tolerance: float) -> ndarray:
+    """
+    Approximates the contour by a polygon with fewer vertices (Douglas-Peucker).
+    :param contour: input contour
+    :param tolerance: maximum distance of the polygon from the contour, relative to the contour perimeter
+    :return: simplified contour (the input contour if tolerance is not positive)
+    """
+    if tolerance <= 0:
+        return contour
+    return approxPolyDP(contour, tolerance * arcLength(contour, True), True)
+
+
 def findMinEnclosingCircle(contour: ndarray) -> tuple:
     """
     Find minimum enclosing circle of the input contour.
@@ -45,6 +61,15 @@ def findMinEnclosingCircle(contour: ndarray) -> tuple:
     return center, radius
 
 
+def findBoundingRect(contour: ndarray) -> tuple:
+    """
+    Find upright bounding rectangle of the contour.
+    :param contour: input contour
+    :return: (x, y, width, height) of the rectangle
+    """
+    return tuple(int(value) for value in boundingRect(contour))
+
+
 def findContourExtremePoints(contour: ndarray) -> tuple:
     """
     Find extreme points in the given contour.
@@ -116,6 +141,28 @@ def getConvexPoints(contour, defects, type="start"):
     return points
 
 
+class DefectGeometry(NamedTuple):
+    start: ndarray
+    end: ndarray
+    far: ndarray
+    depth: ndarray
+
+
+def getDefectGeometry(contour: ndarray, defects: ndarray) -> DefectGeometry:
+    """
+    Array version of getConvexPoints - gathers start, end and far points of all defects at once.
+    :param contour: contour the defects are found in
+    :param defects: (N, 1, 4) array returned by findConvexityDefects (or None if there are no defects)
+    :return: DefectGeometry with (N, 2) arrays of start, end and far points and (N,) array of fixed-point depths
+    """
+    contourPoints = contour.reshape(-1, 2)
+    if defects is None:
+        defects = np.empty((0, 4), dtype=np.int32)
+    defects = defects.reshape(-1, 4)
+    return DefectGeometry(contourPoints[defects[:, 0]], contourPoints[defects[:, 1]], contourPoints[defects[:, 2]],
+                          defects[:, 3])
+
+
 def drawConvexHull(image, points, pointsColor=(255, 128, 64), lineColor=(0, 255, 0)):
     for point in points:
         drawPoint(image, point[0], 5, color=pointsColor)
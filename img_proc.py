@@ -147,20 +147,44 @@ def binarizeImage(image, threshold=127, newValue=255, thresholdType=cv2.THRESH_B
     return cv2.threshold(image, threshold, newValue, thresholdType)[1]
 
 
+EXACT_ROTATIONS = {90: cv2.ROTATE_90_COUNTERCLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_CLOCKWISE}
+
+
+def isExactRotation(angle: float) -> bool:
+    """
+    Checks if rotation by the given angle can be done exactly - by transposing/flipping the image.
+    :param angle: rotation angle in degrees
+    :return: True for multiples of 90 degrees
+    """
+    return angle % 360 in EXACT_ROTATIONS
+
+
 def rotateImage(image, angle):
+    """
+    Rotates the image counter-clockwise by the given angle (in degrees). Rotations by multiples of 90 degrees are
+    exact (transpose/flip) and change the image shape, other angles are interpolated onto the original canvas.
+    :param image: input image
+    :param angle: rotation angle in degrees
+    :return: rotated image
+    """
+    if angle % 360 == 0:
+        return image
+    if isExactRotation(angle):
+        return cv2.rotate(image, EXACT_ROTATIONS[angle % 360])
     imageCenter = tuple(np.array(image.shape[1::-1]) / 2)
     rotMatrix = cv2.getRotationMatrix2D(imageCenter, angle, 1.0)
     result = cv2.warpAffine(image, rotMatrix, image.shape[1::-1], flags=cv2.INTER_LINEAR)
     return result
 
 
-def emptyImage(shape: tuple) -> np.ndarray:
+def emptyImage(shape: tuple, dtype: type = np.float64) -> np.ndarray:
     """
     Creates zero (empty) image of the given shape.
     :param shape: shape of the image
+    :param dtype: data type of the image
     :return: zero matrix - image
     """
-    return np.zeros(shape)
+    return np.zeros(shape, dtype)
 
 
 def cloneImage(image: np.ndarray) -> np.ndarray:
@@ -229,15 +253,17 @@ def blend(image: np.ndarray, mask: np.ndarray, color: tuple) -> np.ndarray:
 
 
 def findEdgeNonBlackPixel(image, startEnd="start"):
-    prev = None
+    """
+    Finds the row where the first column turns from black to non-black - searching from the top ("start") or from
+    the bottom ("end") of the image. Used to crop black borders left by the rotation.
+    :param image: input image
+    :param startEnd: search direction - "start" or "end"
+    :return: index of the first non-black row after the black border or None if there is no such row
+    """
+    column = image[:, 0]
+    black = ~column.reshape(column.shape[0], -1).any(axis=1)
     if startEnd == "start":
-        for i in range(image.shape[0]):
-            if sum(prev == np.zeros((1,3))[0]) == 3 and sum(image[i,0] == np.zeros((1,3))[0]) != 3:
-                return i
-            prev = image[i,0]
-    else:
-        for i in range(image.shape[0]-1, -1, -1):
-            if sum(prev == np.zeros((1,3))[0]) == 3 and sum(image[i,0] == np.zeros((1,3))[0]) != 3:
-                return i
-            prev = image[i,0]
-    return None
+        rows = np.flatnonzero(black[:-1] & ~black[1:]) + 1
+        return int(rows[0]) if rows.size else None
+    rows = np.flatnonzero(black[1:] & ~black[:-1])
+    return int(rows[-1]) if rows.size else None
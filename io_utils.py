@@ -1,13 +1,18 @@
 from exceptions import InvalidCommandLineArgsError
-from image_param import ImageParam
+from image_param import ImageParam, DEFAULT_PARAMS
 
 
 # TODO: recode this - not elegant solution + move this to the separate file
 def waitUntilEnter():
     input()
 
-# easier to maintain
-def parseArguments(arguments: list):
+
+def parseArgumentsMap(arguments: list) -> dict:
+    """
+    Parses image parameters given in the form --paramName value.
+    :param arguments: list of command line arguments
+    :return: map of parameter names and parsed values
+    """
     argsMap = {}
     if len(arguments) % 2 == 1:
         raise InvalidCommandLineArgsError("Number of command line arguments must be even.")
@@ -18,4 +23,15 @@ def parseArguments(arguments: list):
             if "," in argVal:
                 argVal = tuple(argVal.split(","))
                 argsMap[argName] = tuple(map(int, argVal))
-    ImageParam.setParams(**argsMap)
+    return argsMap
+
+
+# easier to maintain
+def parseArguments(arguments: list, params: ImageParam = DEFAULT_PARAMS) -> ImageParam:
+    """
+    Parses image parameters given in the form --paramName value.
+    :param arguments: list of command line arguments
+    :param params: parameters the parsed values are applied to
+    :return: new image parameters
+    """
+    return params.setParams(**parseArgumentsMap(arguments))
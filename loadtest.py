@@ -0,0 +1,92 @@
+"""
+Load test of the inference server (server.py) - POSTs corpus images from concurrent clients and reports throughput,
+latency percentiles and the number of rejected (429) requests.
+
+    python loadtest.py [--url http://127.0.0.1:8080/predict] [--dir images] [--requests 500] [--concurrency 8]
+"""
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from threading import local
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from batch import IMAGE_EXTENSIONS, listDirectory
+from image_param import DEFAULT_PARAMS
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Client:
+    """
+    Keep-alive HTTP connection per client thread.
+    """
+
+    def __init__(self, url: str):
+        self.url = urlsplit(url)
+        self.connections = local()
+
+    def post(self, body: bytes) -> tuple:
+        """
+        :param body: request body
+        :return: (HTTP status, latency in seconds)
+        """
+        connection = getattr(self.connections, "connection", None)
+        if connection is None:
+            connection = self.connections.connection = HTTPConnection(self.url.hostname, self.url.port or 80)
+        path = self.url.path + (f"?{self.url.query}" if self.url.query else "")
+        start = time.perf_counter()
+        try:
+            connection.request("POST", path, body, {"Content-Type": "application/octet-stream"})
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            if response.getheader("Connection", "").lower() == "close":
+                connection.close()
+                self.connections.connection = None
+        except (ConnectionError, OSError):
+            connection.close()
+            self.connections.connection = None
+            status = None
+        return status, time.perf_counter() - start
+
+
+def main(arguments: list):
+    parser = ArgumentParser(description="Load test of the inference server.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/predict", help="prediction endpoint")
+    parser.add_argument("--dir", default="images", help="directory with the posted images")
+    parser.add_argument("--requests", type=int, default=500, help="total number of requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="number of concurrent clients")
+    args = parser.parse_args(arguments)
+
+    bodies = []
+    for path, _ in listDirectory(args.dir, DEFAULT_PARAMS):
+        with open(path, "rb") as file:
+            bodies.append(file.read())
+    if not bodies:
+        raise SystemExit(f"No images ({', '.join(IMAGE_EXTENSIONS)}) found in {args.dir}.")
+
+    client = Client(args.url)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max(1, args.concurrency)) as pool:
+        results = list(pool.map(lambda i: client.post(bodies[i % len(bodies)]), range(args.requests)))
+    seconds = time.perf_counter() - start
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    okLatencies = [latency for status, latency in results if status == 200]
+    print(f"{len(results)} requests in {seconds:.2f} s - {len(results) / seconds:.1f} requests/s, "
+          f"{len(okLatencies) / seconds:.1f} successful/s")
+    print("statuses: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+    if okLatencies:
+        values = np.percentile(okLatencies, PERCENTILES) * 1000
+        print("latency of successful requests: " + ", ".join(f"p{p} {v:.1f} ms" for p, v in zip(PERCENTILES, values)) +
+              f", max {max(okLatencies) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
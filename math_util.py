@@ -1,4 +1,4 @@
-from math import sqrt, acos, atan, pi
+from math import sqrt, acos, atan, pi, nan
 
 
 def euclideanDistance(x1: float, y1: float, x2: float, y2: float) -> float:
@@ -39,7 +39,12 @@ def calculateAngle(a: float, b: float, c: float) -> float:
     # assert isinstance(a, (float, int)) and isinstance(b, (float, int)) and isinstance(c, (float, int)) and \
     #        a > 0 and b > 0 and c > 0, "Invalid arguments values - arguments must be positive numbers."
     # TODO: add check if these value can form triangle ( a + b > c....etc)
-    return acos((b ** 2 + c ** 2 - a ** 2) / (2 * b * c))  # cosine theorem
+    if b == 0 or c == 0:
+        # angle is undefined for degenerate triangle - same result as the division with numpy scalars
+        return nan
+    cosine = (b ** 2 + c ** 2 - a ** 2) / (2 * b * c)  # cosine theorem
+    # rounding can push the cosine of a collinear triangle slightly out of [-1, 1]
+    return acos(min(max(cosine, -1.0), 1.0))
 
 
 # NOTE - used only in test
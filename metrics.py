@@ -0,0 +1,151 @@
+import json
+import re
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter, time
+
+# histogram buckets (upper bounds) of durations in seconds and of counts
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34, 55)
+MAX_SPANS = 1000
+METRIC_PREFIX = "rps_"
+
+
+class Histogram:
+    """
+    Bucket histogram - number of observed values in every bucket (not cumulative), their total number and sum.
+    """
+
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def toDict(self) -> dict:
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "count": self.count, "sum": self.sum}
+
+
+class Metrics:
+    """
+    Registry of the recognition metrics - stage spans (durations), counters and histograms. Nothing is printed,
+    metrics are exported on demand as JSON or in Prometheus text format. Safe to use from multiple threads.
+    """
+
+    def __init__(self, maxSpans: int = MAX_SPANS):
+        self.lock = Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.spans = deque(maxlen=maxSpans)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        :param name: counter name
+        :param value: added value
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float, buckets: tuple = COUNT_BUCKETS) -> None:
+        """
+        :param name: histogram name
+        :param value: observed value
+        :param buckets: bucket upper bounds - used when the histogram is created
+        """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def recordSpan(self, name: str, start: float, seconds: float) -> None:
+        """
+        Records finished span - its duration is observed in the "<name>_seconds" histogram.
+        :param name: span (stage) name
+        :param start: start time (epoch seconds)
+        :param seconds: duration in seconds
+        """
+        self.observe(f"{name}_seconds", seconds, TIME_BUCKETS)
+        with self.lock:
+            self.spans.append({"name": name, "start": start, "seconds": seconds})
+
+    @contextmanager
+    def span(self, name: str):
+        """
+        Context manager that records duration of the enclosed block as a span.
+        :param name: span (stage) name
+        """
+        start, startCounter = time(), perf_counter()
+        try:
+            yield
+        finally:
+            self.recordSpan(name, start, perf_counter() - startCounter)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.spans.clear()
+
+    def toDict(self) -> dict:
+        """
+        :return: JSON-serializable snapshot of all metrics
+        """
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.toDict() for name, histogram in self.histograms.items()},
+                "spans": list(self.spans),
+            }
+
+    def toJson(self, **kwargs) -> str:
+        return json.dumps(self.toDict(), **kwargs)
+
+    def toPrometheus(self) -> str:
+        """
+        :return: counters and histograms in Prometheus text exposition format (spans are not exported)
+        """
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                metricName = prometheusName(name) + "_total"
+                lines += [f"# TYPE {metricName} counter", f"{metricName} {value}"]
+            for name, histogram in sorted(self.histograms.items()):
+                metricName = prometheusName(name)
+                lines.append(f"# TYPE {metricName} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metricName}_bucket{{le="{bound}"}} {cumulative}')
+                lines += [f"{metricName}_sum {histogram.sum}", f"{metricName}_count {histogram.count}"]
+        return "\n".join(lines) + "\n"
+
+
+def prometheusName(name: str) -> str:
+    """
+    :param name: metric name (e.g. stage name in camelCase)
+    :return: metric name in Prometheus convention - prefixed snake_case
+    """
+    name = re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name).lower()
+    return METRIC_PREFIX + re.sub(r"[^a-z0-9_]", "_", name)
+
+
+def writeMetrics(metrics: Metrics, path: str) -> None:
+    """
+    Writes metrics to the file - in Prometheus text format if the file has .prom extension, JSON otherwise.
+    :param metrics: metrics registry
+    :param path: output path
+    """
+    with open(path, "w") as output:
+        output.write(metrics.toPrometheus() if path.endswith(".prom") else metrics.toJson(indent=2))
+
+
+# metrics of the process - used by the interactive recognition
+METRICS = Metrics()
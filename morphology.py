@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+
+from constants import MASK_DILATE_ITER, MASK_ERODE_ITER
+
+# n iterations with the k x k rectangle are equal to a single pass with the (n * (k - 1) + 1) rectangle
+BASE_KERNEL_SIZE = 3
+
+
+def iteratedRectKernel(iterations: int, kernelSize: int = BASE_KERNEL_SIZE) -> np.ndarray:
+    """
+    Creates rectangular structuring element equivalent to the repeated application of the smaller rectangle.
+    :param iterations: number of applications of the smaller rectangle
+    :param kernelSize: size of the smaller rectangle
+    :return: structuring element
+    """
+    assert isinstance(iterations, int) and iterations > 0, "Number of iterations must be positive integer."
+    size = iterations * (kernelSize - 1) + 1
+    return cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))
+
+
+def dilateRect(image: np.ndarray, iterations: int, kernelSize: int = BASE_KERNEL_SIZE) -> np.ndarray:
+    """
+    Single-pass equivalent of applyDilation(image, (kernelSize, kernelSize) rectangle, iterations).
+    :param image: image that will be dilated
+    :param iterations: number of dilations that should be replaced
+    :param kernelSize: size of the rectangle used in each of the replaced dilations
+    :return: dilated image
+    """
+    return cv2.dilate(image, iteratedRectKernel(iterations, kernelSize))
+
+
+def erodeRect(image: np.ndarray, iterations: int, kernelSize: int = BASE_KERNEL_SIZE) -> np.ndarray:
+    """
+    Single-pass equivalent of applyErosion(image, (kernelSize, kernelSize) rectangle, iterations).
+    :param image: image that will be eroded
+    :param iterations: number of erosions that should be replaced
+    :param kernelSize: size of the rectangle used in each of the replaced erosions
+    :return: eroded image
+    """
+    return cv2.erode(image, iteratedRectKernel(iterations, kernelSize))
+
+
+def closeMask(mask: np.ndarray, dilateIterations: int = MASK_DILATE_ITER,
+              erodeIterations: int = MASK_ERODE_ITER) -> np.ndarray:
+    """
+    Morphological closing of the mask - the same output as applyDilation(mask, None, dilateIterations) followed by
+    applyErosion(mask, None, erodeIterations), computed in two passes over the uint8 mask.
+    :param mask: uint8 mask
+    :param dilateIterations: number of 3x3 dilations
+    :param erodeIterations: number of 3x3 erosions
+    :return: closed mask
+    """
+    assert mask is not None and isinstance(mask, np.ndarray) and mask.dtype == np.uint8, "Mask must be uint8 image."
+    return erodeRect(dilateRect(mask, dilateIterations), erodeIterations)
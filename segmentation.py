@@ -0,0 +1,113 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from constants import SKIN_HUE_RANGES, SKIN_SATURATION_RANGE, SKIN_VALUE_RANGE, SKIN_LUT_BITS
+from img_contours import findImageContours, findMaxContour
+
+# factor the foreground mask is reduced by before the connected components are labeled
+COMPONENT_REDUCTION = 4
+
+
+def thresholdForeground(gray: np.ndarray) -> np.ndarray:
+    """
+    Separates foreground (hand) from the evenly lit background by Otsu thresholding - the foreground is the side of the
+    threshold that the majority of the image border is not on.
+    :param gray: grayscale image
+    :return: uint8 mask - 255 for foreground pixels
+    """
+    foreground = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    border = np.concatenate((foreground[0], foreground[-1], foreground[1:-1, 0], foreground[1:-1, -1]))
+    if np.count_nonzero(border) * 2 > border.size:
+        cv2.bitwise_not(foreground, foreground)
+    return foreground
+
+
+def findLargestComponent(foreground: np.ndarray, reduction: int = COMPONENT_REDUCTION) -> tuple:
+    """
+    Finds bounding box of the largest 8-connected component of the mask from the component statistics. Statistics are
+    computed on the mask reduced by the given factor - a reduced pixel is the maximum of its reduction x reduction
+    block (blocks at the right and bottom edges are partial), so every component of the mask lies within the blocks of
+    a single reduced component and the box mapped back to the mask is not cut.
+    :param foreground: uint8 mask
+    :param reduction: reduction factor of the mask the statistics are computed on
+    :return: (x, y, width, height) of the component bounding box or None if the mask is empty
+    """
+    height, width = foreground.shape[:2]
+    reduction = max(1, min(reduction, height, width))
+    reduced = foreground
+    if reduction > 1:
+        # maximum of the block starting at every pixel, sampled at the block corners
+        kernel = np.ones((reduction, reduction), dtype=np.uint8)
+        reduced = np.ascontiguousarray(cv2.dilate(foreground, kernel, anchor=(0, 0))[::reduction, ::reduction])
+    count, _, stats, _ = cv2.connectedComponentsWithStats((reduced > 0).view(np.uint8), connectivity=8)
+    if count < 2:
+        return None
+    label = 1 + int(stats[1:, cv2.CC_STAT_AREA].argmax())
+    x, y, w, h = (int(value) * reduction for value in stats[label, :cv2.CC_STAT_AREA])
+    return x, y, min(w, width - x), min(h, height - y)
+
+
+def findComponentContours(foreground: np.ndarray, method: int = cv2.CHAIN_APPROX_NONE,
+                          reduction: int = COMPONENT_REDUCTION) -> list:
+    """
+    Finds contour of the largest connected component of the mask - only the bounding box of the component is traced.
+    :param foreground: uint8 mask
+    :param method: contour approximation method - SIMPLE or NONE
+    :param reduction: reduction factor of the mask the component is selected on
+    :return: list with the external contour of the component in the mask coordinates (empty if the mask is empty)
+    """
+    box = findLargestComponent(foreground, reduction)
+    if box is None:
+        return []
+    x, y, w, h = box
+    contours = findImageContours(np.ascontiguousarray(foreground[y:y + h, x:x + w]), method=method)
+    if len(contours) == 0:
+        return []
+    return [findMaxContour(contours) + np.array([x, y], dtype=np.int32)]
+
+
+@lru_cache(maxsize=None)
+def createSkinLut(bits: int = SKIN_LUT_BITS, hueRanges: tuple = SKIN_HUE_RANGES,
+                  saturationRange: tuple = SKIN_SATURATION_RANGE, valueRange: tuple = SKIN_VALUE_RANGE) -> np.ndarray:
+    """
+    Precomputes skin classification of the quantized BGR color space - centre of every color cell is converted to HSV
+    and tested against the skin ranges once, so the pixels are classified by a single table lookup.
+    :param bits: bits per channel of the quantized colors
+    :param hueRanges: skin hue ranges
+    :param saturationRange: skin saturation range
+    :param valueRange: skin value range
+    :return: uint8 table (255 - skin) indexed by (b << 2 * bits) | (g << bits) | r of the quantized colors
+    """
+    levels = 1 << bits
+    centres = (np.arange(levels) << (8 - bits)) + (1 << (8 - bits) >> 1)
+    cells = np.stack(np.meshgrid(centres, centres, centres, indexing="ij"), axis=-1).astype(np.uint8)
+    hsv = cv2.cvtColor(cells.reshape(-1, 1, 3), cv2.COLOR_BGR2HSV).reshape(-1, 3)
+    hue, saturation, value = hsv[:, 0], hsv[:, 1], hsv[:, 2]
+    skin = np.zeros(len(hsv), dtype=bool)
+    for low, high in hueRanges:
+        skin |= (low <= hue) & (hue <= high)
+    skin &= (saturationRange[0] <= saturation) & (saturation <= saturationRange[1])
+    skin &= (valueRange[0] <= value) & (value <= valueRange[1])
+    return skin.astype(np.uint8) * 255
+
+
+def segmentSkin(image: np.ndarray, lut: np.ndarray = None, bits: int = SKIN_LUT_BITS) -> np.ndarray:
+    """
+    Classifies pixels of the BGR image by the skin lookup table.
+    :param image: BGR image
+    :param lut: lookup table created by createSkinLut (default skin ranges if not given)
+    :param bits: bits per channel of the lookup table index
+    :return: uint8 mask - 255 for skin pixels
+    """
+    if lut is None:
+        lut = createSkinLut(bits)
+    blue, green, red = cv2.split(image)
+    shift = 8 - bits
+    index = (blue >> shift).astype(np.uint16)
+    index <<= bits
+    index |= green >> shift
+    index <<= bits
+    index |= red >> shift
+    return lut.take(index)
@@ -0,0 +1,200 @@
+"""
+Local HTTP inference server - gesture classification of POSTed JPEG/PNG images.
+
+    python server.py [--host 127.0.0.1] [--port 8080] [--workers 4] [--threads] [--queueSize 16] [--angleOffset 15 ...]
+
+    curl --data-binary @images/paper_1.jpg "http://127.0.0.1:8080/predict?angleOffset=30"
+    curl http://127.0.0.1:8080/metrics
+
+Endpoints:
+    POST /predict   image bytes in the body, ImageParam overrides in the query string - JSON with the gesture,
+                    credibility, key points and latency
+    GET  /health    JSON with the number of requests in flight
+    GET  /metrics   server metrics in Prometheus text format
+
+Connections are handled by an asyncio front end, recognition runs in a pool of worker processes (or threads). At most
+workers + queueSize requests are accepted at a time - further requests are rejected with 429 Too Many Requests.
+"""
+import asyncio
+import json
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from multiprocessing import cpu_count
+from urllib.parse import urlsplit, parse_qsl
+
+from batch import getWorkerPipeline
+from exceptions import ImageNotFoundError, InvalidCommandLineArgsError
+from image_param import ImageParam
+from io_utils import parseArguments, parseArgumentsMap
+from metrics import Metrics, TIME_BUCKETS
+
+MAX_HEADER_BYTES = 16 * 1024
+DEFAULT_MAX_BODY_MB = 32
+
+
+def classifyBytes(imageBytes: bytes, params: ImageParam) -> tuple:
+    """
+    Classifies the encoded image - meant to be run in a worker process or thread.
+    :param imageBytes: content of the image file
+    :param params: image parameters
+    :return: (HTTP status, JSON-serializable response)
+    """
+    start = time.perf_counter()
+    try:
+        response = getWorkerPipeline().evaluateBytes(imageBytes, params)["gesture"].toDict()
+        status = HTTPStatus.OK
+    except ImageNotFoundError as e:
+        response, status = {"error": f"{type(e).__name__}: {e}"}, HTTPStatus.BAD_REQUEST
+    except Exception as e:
+        response, status = {"error": f"{type(e).__name__}: {e}"}, HTTPStatus.UNPROCESSABLE_ENTITY
+    response["latencyMs"] = round((time.perf_counter() - start) * 1000, 3)
+    return status, response
+
+
+class InferenceServer:
+    """
+    Asyncio HTTP/1.1 front end (keep-alive, Content-Length bodies) that hands recognition to the executor and rejects
+    requests above the capacity (workers + queue size) with 429.
+    """
+
+    def __init__(self, executor, workers: int, queueSize: int, params: ImageParam,
+                 maxBodyBytes: int = DEFAULT_MAX_BODY_MB * 1024 * 1024):
+        self.executor = executor
+        self.capacity = workers + queueSize
+        self.params = params
+        self.maxBodyBytes = maxBodyBytes
+        self.inFlight = 0
+        self.metrics = Metrics()
+
+    async def handleConnection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            keepAlive = True
+            while keepAlive:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                       {"error": "Header is too large."})
+                    break
+                requestLine, *headerLines = head.decode("latin-1").split("\r\n")
+                method, target, version = (requestLine.split(" ") + ["", ""])[:3]
+                headers = {}
+                for headerLine in headerLines:
+                    name, _, value = headerLine.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keepAlive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+                length = headers.get("content-length", "0")
+                if not length.isdigit():
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length."})
+                    break
+                if int(length) > self.maxBodyBytes:
+                    await self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Image is too large."})
+                    break
+                body = await reader.readexactly(int(length))
+                status, response, contentType = await self.route(method, target, body)
+                await self.respond(writer, status, response, contentType, keepAlive)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, target: str, body: bytes) -> tuple:
+        """
+        :param method: HTTP method
+        :param target: request target (path and query)
+        :param body: request body
+        :return: (HTTP status, response, content type)
+        """
+        url = urlsplit(target)
+        if url.path == "/predict" and method == "POST":
+            status, response = await self.predict(body, url.query)
+            return status, response, "application/json"
+        if url.path == "/health" and method == "GET":
+            return HTTPStatus.OK, {"status": "ok", "inFlight": self.inFlight, "capacity": self.capacity}, \
+                "application/json"
+        if url.path == "/metrics" and method == "GET":
+            return HTTPStatus.OK, self.metrics.toPrometheus(), "text/plain; version=0.0.4"
+        return HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint: {method} {url.path}."}, "application/json"
+
+    async def predict(self, body: bytes, query: str) -> tuple:
+        """
+        :param body: image bytes
+        :param query: query string with ImageParam overrides
+        :return: (HTTP status, JSON-serializable response)
+        """
+        self.metrics.increment("requests")
+        if self.inFlight >= self.capacity:
+            self.metrics.increment("rejected")
+            return HTTPStatus.TOO_MANY_REQUESTS, {"error": "Server is saturated, retry later."}
+        try:
+            overrides = parseArgumentsMap([item for name, value in parse_qsl(query) for item in (f"--{name}", value)])
+        except (InvalidCommandLineArgsError, ValueError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": f"Invalid parameters: {e}"}
+        if not body:
+            return HTTPStatus.BAD_REQUEST, {"error": "Image bytes must be sent in the request body."}
+        self.inFlight += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            status, response = await loop.run_in_executor(self.executor, classifyBytes, body,
+                                                          self.params.setParams(**overrides))
+        finally:
+            self.inFlight -= 1
+        seconds = time.perf_counter() - start
+        self.metrics.observe("request_seconds", seconds, TIME_BUCKETS)
+        self.metrics.observe("queue_seconds", max(0.0, seconds - response["latencyMs"] / 1000), TIME_BUCKETS)
+        if status != HTTPStatus.OK:
+            self.metrics.increment("errors")
+        else:
+            self.metrics.increment(f"gesture_{response['gesture']}")
+        return status, response
+
+    async def respond(self, writer: asyncio.StreamWriter, status: HTTPStatus, response,
+                      contentType: str = "application/json", keepAlive: bool = False) -> None:
+        body = (response if isinstance(response, str) else json.dumps(response)).encode()
+        headers = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Type: {contentType}",
+                   f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keepAlive else 'close'}"]
+        if status == HTTPStatus.TOO_MANY_REQUESTS:
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+
+async def serve(host: str, port: int, server: InferenceServer) -> None:
+    listener = await asyncio.start_server(server.handleConnection, host, port, limit=MAX_HEADER_BYTES)
+    print(f"Listening on http://{host}:{port} - capacity {server.capacity} requests", file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(arguments: list):
+    parser = ArgumentParser(description="Local HTTP rock-paper-scissors gesture classification server.")
+    parser.add_argument("--host", default="127.0.0.1", help="listening address")
+    parser.add_argument("--port", type=int, default=8080, help="listening port")
+    parser.add_argument("--workers", type=int, default=cpu_count(), help="number of workers")
+    parser.add_argument("--threads", action="store_true", help="use threads instead of processes")
+    parser.add_argument("--queueSize", type=int, default=16, help="number of requests waiting for a worker")
+    parser.add_argument("--maxBodyMB", type=float, default=DEFAULT_MAX_BODY_MB, help="maximum image size in MB")
+    args, paramArguments = parser.parse_known_args(arguments)
+    params = parseArguments(paramArguments)
+
+    workers = max(1, args.workers)
+    executor = (ThreadPoolExecutor if args.threads else ProcessPoolExecutor)(workers)
+    server = InferenceServer(executor, workers, max(0, args.queueSize), params, int(args.maxBodyMB * 1024 * 1024))
+    try:
+        asyncio.run(serve(args.host, args.port, server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,164 @@
+import os
+from collections import OrderedDict
+from hashlib import sha1
+from tempfile import mkstemp
+from threading import Lock
+
+import numpy as np
+
+# stages persisted by default - everything the gesture recognition needs from the pixels
+CACHED_STAGES = ("contours", "maxContour", "defects")
+CACHE_FILE_EXTENSION = ".npz"
+# the directory is re-scanned after every maxBytes / RESCAN_FRACTION written bytes - entries written by other
+# processes sharing the directory are then counted in the size limit as well
+RESCAN_FRACTION = 16
+
+
+def encodeStageOutput(value) -> dict:
+    """
+    Encodes stage output (contour, list of contours, defects or None) into int32 arrays.
+    :param value: stage output
+    :return: map of array names and arrays
+    """
+    if value is None:
+        return {"none": np.empty(0, dtype=np.int32)}
+    if isinstance(value, np.ndarray):
+        return {"array": value.astype(np.int32, copy=False)}
+    lengths = np.array([len(contour) for contour in value], dtype=np.int32)
+    points = np.concatenate([contour.reshape(-1, 2) for contour in value]) if len(value) else np.empty((0, 2))
+    return {"points": points.astype(np.int32, copy=False), "lengths": lengths}
+
+
+def decodeStageOutput(arrays) -> object:
+    """
+    Inverse of encodeStageOutput.
+    :param arrays: map of array names and arrays
+    :return: stage output
+    """
+    if "none" in arrays:
+        return None
+    if "array" in arrays:
+        return arrays["array"]
+    points, lengths = arrays["points"], arrays["lengths"]
+    if lengths.size == 0:
+        return []
+    return [contour.reshape(-1, 1, 2) for contour in np.split(points, np.cumsum(lengths)[:-1])]
+
+
+class StageCache:
+    """
+    Content-addressed on-disk cache of the stage outputs (contours and convexity defects). Entries are keyed by the
+    stage key - hash of the image bytes and the parameters of all stages that lead to the output - and stored as
+    uncompressed int32 arrays. Least recently used entries are evicted when the total size exceeds the limit.
+    Can be used as a memo of the stage graph evaluation - outputs of the other stages are not stored.
+    Instance can be shared by threads. Processes can share the directory - each of them re-scans it before evicting
+    and after writing maxBytes / RESCAN_FRACTION bytes, so the directory exceeds the limit by at most that amount
+    per process (not by the whole limit).
+    """
+
+    def __init__(self, directory: str, maxBytes: int = 256 * 1024 * 1024, stages: tuple = CACHED_STAGES):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.stages = frozenset(stages)
+        self.lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.scan()
+
+    def scan(self) -> None:
+        """
+        Rebuilds the index of the entries (in order of their last use) and their total size from the directory.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(CACHE_FILE_EXTENSION):
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.path, stat.st_size))
+                except FileNotFoundError:
+                    pass  # removed by another process
+        self.entries = OrderedDict((path, size) for _, path, size in sorted(entries))
+        self.totalBytes = sum(self.entries.values())
+        self.writtenBytes = 0
+
+    def entryPath(self, key: tuple) -> str:
+        """
+        :param key: stage key
+        :return: path of the cache file
+        """
+        return os.path.join(self.directory, sha1(repr(key).encode()).hexdigest() + CACHE_FILE_EXTENSION)
+
+    def isCached(self, key: tuple) -> bool:
+        """
+        :param key: stage key - (stage name, ...)
+        :return: True if the output of the stage is persisted in this cache
+        """
+        return key[0] in self.stages
+
+    def __contains__(self, key: tuple) -> bool:
+        return self.isCached(key) and os.path.exists(self.entryPath(key))
+
+    def __getitem__(self, key: tuple) -> tuple:
+        if not self.isCached(key):
+            raise KeyError(key)
+        path = self.entryPath(key)
+        try:
+            with np.load(path) as arrays:
+                value = decodeStageOutput({name: arrays[name] for name in arrays.files})
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            raise KeyError(key)
+        with self.lock:
+            if path in self.entries:
+                self.entries.move_to_end(path)
+        # stage did not run - no processing time
+        return value, 0.0
+
+    def __setitem__(self, key: tuple, valueAndSeconds: tuple) -> None:
+        if not self.isCached(key):
+            return
+        path = self.entryPath(key)
+        # unique temporary file - threads and processes may write the same entry at once
+        descriptor, temporaryPath = mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                np.savez(file, **encodeStageOutput(valueAndSeconds[0]))
+            size = os.path.getsize(temporaryPath)
+            os.replace(temporaryPath, path)
+        except BaseException:
+            try:
+                os.remove(temporaryPath)
+            except FileNotFoundError:
+                pass
+            raise
+        with self.lock:
+            self.totalBytes += size - self.entries.pop(path, 0)
+            self.entries[path] = size
+            self.writtenBytes += size
+            self.evict()
+
+    def get(self, key: tuple, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def evict(self) -> None:
+        """
+        Removes least recently used entries once the cache exceeds the size limit - the directory is re-scanned first
+        (also after enough bytes were written since the last scan) and entries are removed until the cache is
+        maxBytes / RESCAN_FRACTION below the limit, so a full cache is not re-scanned on every write. Must be called
+        with the lock held.
+        """
+        if self.totalBytes > self.maxBytes or self.writtenBytes * RESCAN_FRACTION >= self.maxBytes:
+            self.scan()
+        if self.totalBytes <= self.maxBytes:
+            return
+        targetBytes = self.maxBytes - self.maxBytes // RESCAN_FRACTION
+        while self.totalBytes > targetBytes and self.entries:
+            path, size = self.entries.popitem(last=False)
+            self.totalBytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
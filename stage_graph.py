@@ -0,0 +1,156 @@
+from hashlib import sha256
+from time import perf_counter, time
+from typing import NamedTuple, Callable
+
+from exceptions import InvalidArgumentTypeOrValueError
+from metrics import Metrics
+
+# name of the source with parameters (ImageParam) - stages declare which of its fields they depend on
+PARAMS_SOURCE = "params"
+
+
+class Stage(NamedTuple):
+    name: str
+    function: Callable
+    inputs: tuple
+    paramFields: tuple
+
+
+class StageGraph:
+    """
+    Graph of named processing stages. Every stage is a function of the outputs of its input stages (or of the source
+    values given at evaluation time). Stages are evaluated lazily - only when their output is requested. Every stage
+    that runs is recorded as a span in the metrics (if given).
+    """
+
+    def __init__(self, metrics: Metrics = None):
+        self.stages = {}
+        self.metrics = metrics
+
+    def addStage(self, name: str, function: Callable, *inputs: str, paramFields: tuple = None) -> None:
+        """
+        Adds stage to the graph.
+        :param name: stage name
+        :param function: function that computes stage output from the outputs of the input stages
+        :param inputs: names of the input stages/sources, in order of function arguments
+        :param paramFields: fields of the "params" source the stage output depends on - lets evaluations with
+        different parameters share the stage output (if not given, stage depends on all parameters)
+        """
+        if name in self.stages:
+            raise InvalidArgumentTypeOrValueError(f"Stage {name} already exists.")
+        self.stages[name] = Stage(name, function, inputs, tuple(paramFields) if paramFields is not None else None)
+
+    def evaluate(self, memo: dict = None, **sources) -> "StageEvaluation":
+        """
+        Creates lazy evaluation of the graph for the given source values.
+        :param memo: stage outputs shared between evaluations of the same source values (other than "params"),
+        e.g. evaluations of one image with different parameters
+        :param sources: source values (e.g. image=..., params=...)
+        :return: evaluation whose stage outputs are computed on demand
+        """
+        return StageEvaluation(self, sources, memo)
+
+
+class StageEvaluation:
+    """
+    Single (lazy) evaluation of the stage graph. Outputs are computed on the first request and memoized, profile
+    records every stage that actually ran with its duration (in seconds), in order of completion. Stage outputs
+    found in the shared memo (any mapping of stage keys to (output, seconds)) are reused and not profiled.
+    """
+
+    def __init__(self, graph: StageGraph, sources: dict, memo: dict = None):
+        self.graph = graph
+        self.values = dict(sources)
+        self.memo = memo if memo is not None else {}
+        self.keys = {}
+        self.profile = []
+
+    def stageKey(self, name: str) -> tuple:
+        """
+        Key of the stage output - stage name, values of the parameters it depends on and keys of its inputs.
+        :param name: stage or source name
+        :return: hashable key
+        """
+        if name in self.keys:
+            return self.keys[name]
+        stage = self.graph.stages.get(name)
+        if name in self.values:
+            # source value - bytes are content-addressed, other unhashable values are identified by the object
+            value = self.values[name]
+            if isinstance(value, bytes):
+                key = (name, sha256(value).hexdigest())
+            else:
+                try:
+                    hash(value)
+                    key = (name, value)
+                except TypeError:
+                    key = (name, id(value))
+        elif stage is None:
+            raise InvalidArgumentTypeOrValueError(f"Unknown stage or source: {name}.")
+        else:
+            inputs = stage.inputs
+            paramValues = ()
+            if stage.paramFields is not None:
+                params = self.values[PARAMS_SOURCE]
+                paramValues = tuple(getattr(params, field) for field in stage.paramFields)
+                inputs = tuple(inputName for inputName in inputs if inputName != PARAMS_SOURCE)
+            key = (name, paramValues, tuple(self.stageKey(inputName) for inputName in inputs))
+        self.keys[name] = key
+        return key
+
+    def __getitem__(self, name: str):
+        if name in self.values:
+            return self.values[name]
+        stage = self.graph.stages.get(name)
+        if stage is None:
+            raise InvalidArgumentTypeOrValueError(f"Unknown stage or source: {name}.")
+        key = self.stageKey(name)
+        memoized = self.memo.get(key)
+        if memoized is not None:
+            value = memoized[0]
+        else:
+            arguments = [self[inputName] for inputName in stage.inputs]
+            startTime, start = time(), perf_counter()
+            value = stage.function(*arguments)
+            seconds = perf_counter() - start
+            self.profile.append((name, seconds))
+            if self.graph.metrics is not None:
+                self.graph.metrics.recordSpan(name, startTime, seconds)
+            self.memo[key] = (value, seconds)
+        self.values[name] = value
+        return value
+
+    @property
+    def durations(self) -> dict:
+        """
+        :return: map of the used stages (computed or reused from the shared memo, with the stages they were computed
+        from) and their durations in seconds
+        """
+        durations = dict(self.profile)
+        for name, key in self.keys.items():
+            if name not in durations and name in self.graph.stages:
+                memoized = self.memo.get(key)
+                if memoized is not None:
+                    durations[name] = memoized[1]
+        return durations
+
+    @property
+    def totalSeconds(self) -> float:
+        """
+        :return: summed duration of all used stages
+        """
+        return sum(self.durations.values())
+
+    def isEvaluated(self, name: str) -> bool:
+        """
+        :param name: stage name
+        :return: True if stage output is already available
+        """
+        return name in self.values
+
+    @property
+    def ranStages(self) -> list:
+        """
+        :return: names of the stages that ran, in order of completion
+        """
+        return [name for name, _ in self.profile]
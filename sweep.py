@@ -0,0 +1,215 @@
+"""
+Parameter sweep (auto-tuning) of the image parameters over the labeled image corpus.
+
+    python sweep.py --manifest images/manifest.txt --grid "valleyDepthThreshold=50|70|90" --grid "cannyThreshold1=5|10|20"
+    python sweep.py --dir images --search random --samples 20 --grid ... [--workers 4] [--output sweep.json]
+    python sweep.py --manifest images/manifest.txt --search coordinate --rounds 3 --grid ...
+
+Alternative values of a parameter are separated by "|" (tuple values use ",", e.g. "angleBounds=70,100|75,105").
+Per-image parameters from the manifest take precedence over the swept values. Every image is decoded once per
+evaluated batch of configurations and stages whose parameters do not change between the configurations (e.g. edge
+detection when only decision thresholds are swept) are computed once and shared. For every configuration the
+accuracy and the processing time per image (as if it ran alone) are reported.
+"""
+import json
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from itertools import product
+from multiprocessing import Pool, cpu_count
+
+from cv2 import imread
+
+from batch import labelFromFileName, listDirectory, readManifestEntries
+from exceptions import InvalidCommandLineArgsError, ImageNotFoundError, HandNotFoundError
+from gesture_pipeline import GesturePipeline
+from image_param import ImageParam
+from io_utils import parseArguments, parseArgumentsMap
+
+SEARCH_METHODS = ("grid", "random", "coordinate")
+
+
+def parseSearchSpace(gridArguments: list) -> dict:
+    """
+    Parses swept parameters given in the form name=value1|value2|...
+    :param gridArguments: list of parameter definitions
+    :return: map of parameter names and lists of their values
+    """
+    space = {}
+    for argument in gridArguments:
+        name, _, values = argument.partition("=")
+        if name not in ImageParam._fields or not values:
+            raise InvalidCommandLineArgsError(f"Invalid swept parameter: {argument}.")
+        space[name] = []
+        for value in values.split("|"):
+            parsed = parseArgumentsMap([f"--{name}", value])
+            if name not in parsed:
+                raise InvalidCommandLineArgsError(f"Invalid value of the parameter {name}: {value}.")
+            space[name].append(parsed[name])
+    return space
+
+
+def gridConfigs(base: ImageParam, space: dict) -> list:
+    """
+    :param base: parameters the swept values are applied to
+    :param space: map of parameter names and lists of their values
+    :return: all combinations of the swept values
+    """
+    names = list(space)
+    return [base.setParams(**dict(zip(names, values))) for values in product(*space.values())]
+
+
+def randomConfigs(base: ImageParam, space: dict, samples: int, seed: int) -> list:
+    """
+    :param base: parameters the swept values are applied to
+    :param space: map of parameter names and lists of their values
+    :param samples: number of sampled combinations
+    :param seed: random seed
+    :return: random sample (without repetition) of the combinations of the swept values
+    """
+    configs = gridConfigs(base, space)
+    if samples >= len(configs):
+        return configs
+    return random.Random(seed).sample(configs, samples)
+
+
+def evaluateImage(task: tuple) -> tuple:
+    """
+    Recognizes gesture on a single image for all configurations - meant to be run in a worker process. Stage
+    outputs are shared between the configurations that do not change their parameters. Errors are reported to
+    stderr and the image is counted as not recognized (for one configuration or all if the image cannot be read).
+    :param task: (image path, per-image parameter overrides, list of configurations)
+    :return: (image label, list of (recognized gesture or None, processing seconds) for every configuration)
+    """
+    path, overrides, configs = task
+    label = labelFromFileName(path)
+    start = time.perf_counter()
+    image = imread(path)
+    decodeSeconds = time.perf_counter() - start
+    if image is None:
+        error = ImageNotFoundError(f"Image file {path} cannot be found or decoded.")
+        print(f"{path}: {type(error).__name__}: {error}", file=sys.stderr)
+        return label, [(None, decodeSeconds)] * len(configs)
+    pipeline = GesturePipeline()
+    memo = {}
+    results = []
+    for config in configs:
+        evaluation = None
+        try:
+            params = config.setParams(**overrides)
+            evaluation = pipeline.getGraph(params).evaluate(memo, image=image, params=params)
+            gesture = evaluation["gesture"].gesture
+        except HandNotFoundError:
+            gesture = None
+        except Exception as e:
+            print(f"{path}: {type(e).__name__}: {e}", file=sys.stderr)
+            gesture = None
+        results.append((gesture, decodeSeconds + (evaluation.totalSeconds if evaluation is not None else 0.0)))
+    return label, results
+
+
+def evaluateConfigs(entries: list, configs: list, pool: Pool) -> list:
+    """
+    Evaluates configurations over the labeled images.
+    :param entries: list of (image path, per-image parameter overrides)
+    :param configs: list of configurations
+    :param pool: pool of worker processes
+    :return: list of (configuration, number of correctly recognized images, number of labeled images,
+    average processing seconds per image)
+    """
+    correct = [0] * len(configs)
+    seconds = [0.0] * len(configs)
+    images = 0
+    tasks = [(path, overrides, configs) for path, overrides in entries if labelFromFileName(path)]
+    for label, results in pool.imap_unordered(evaluateImage, tasks):
+        images += 1
+        for i, (gesture, imageSeconds) in enumerate(results):
+            correct[i] += gesture == label
+            seconds[i] += imageSeconds
+    return [(config, correct[i], images, seconds[i] / images if images else 0.0) for i, config in enumerate(configs)]
+
+
+def coordinateSearch(entries: list, base: ImageParam, space: dict, rounds: int, pool: Pool) -> list:
+    """
+    Coordinate search - optimizes one parameter at a time (keeping the others fixed) until no parameter change
+    improves the accuracy or the number of rounds is reached.
+    :param entries: list of (image path, per-image parameter overrides)
+    :param base: starting parameters
+    :param space: map of parameter names and lists of their values
+    :param rounds: maximum number of passes over all parameters
+    :param pool: pool of worker processes
+    :return: scores of all evaluated configurations
+    """
+    scores = {}
+    current = evaluateConfigs(entries, [base], pool)[0]
+    scores[base] = current
+    for _ in range(rounds):
+        improved = False
+        for name, values in space.items():
+            candidates = [current[0].setParams(**{name: value}) for value in values]
+            candidates = [config for config in candidates if config not in scores]
+            for score in evaluateConfigs(entries, candidates, pool):
+                scores[score[0]] = score
+                if score[1] > current[1]:
+                    current, improved = score, True
+        if not improved:
+            break
+    return list(scores.values())
+
+
+def formatConfig(config: ImageParam, base: ImageParam) -> str:
+    """
+    :param config: configuration
+    :param base: parameters the swept values were applied to
+    :return: description of the parameters changed with respect to the base parameters
+    """
+    changed = [f"{name}={value}" for name, value, baseValue in zip(config._fields, config, base) if value != baseValue]
+    return ", ".join(changed) if changed else "(base)"
+
+
+def main(arguments: list):
+    parser = ArgumentParser(description="Parameter sweep over the labeled image corpus.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="directory with images")
+    source.add_argument("--manifest", help="manifest with image paths and per-image parameters")
+    parser.add_argument("--grid", action="append", required=True, help="swept parameter, e.g. blurSize=3|5|7")
+    parser.add_argument("--search", choices=SEARCH_METHODS, default="grid", help="search method")
+    parser.add_argument("--samples", type=int, default=20, help="number of configurations for random search")
+    parser.add_argument("--rounds", type=int, default=3, help="maximum number of rounds of coordinate search")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--workers", type=int, default=cpu_count(), help="number of worker processes")
+    parser.add_argument("--output", help="JSON output file with all scores")
+    args, paramArguments = parser.parse_known_args(arguments)
+    base = parseArguments(paramArguments)
+    space = parseSearchSpace(args.grid)
+
+    if args.manifest:
+        entries = readManifestEntries(args.manifest)
+    else:
+        entries = [(path, {}) for path, _ in listDirectory(args.dir, base)]
+    start = time.perf_counter()
+    with Pool(max(1, args.workers)) as pool:
+        if args.search == "coordinate":
+            scores = coordinateSearch(entries, base, space, args.rounds, pool)
+        elif args.search == "random":
+            scores = evaluateConfigs(entries, randomConfigs(base, space, args.samples, args.seed), pool)
+        else:
+            scores = evaluateConfigs(entries, gridConfigs(base, space), pool)
+    wallSeconds = time.perf_counter() - start
+
+    scores.sort(key=lambda score: (-score[1], score[3]))
+    print(f"{'accuracy':>8}  {'correct':>9}  {'ms/image':>8}  parameters")
+    for config, correct, images, seconds in scores:
+        accuracy = correct / images if images else 0.0
+        print(f"{accuracy:>8.2%}  {f'{correct}/{images}':>9}  {seconds * 1000:>8.1f}  {formatConfig(config, base)}")
+    print(f"{len(scores)} configurations evaluated in {wallSeconds:.2f} s", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump([{"params": config._asdict(), "correct": correct, "images": images,
+                        "accuracy": correct / images if images else None, "msPerImage": seconds * 1000}
+                       for config, correct, images, seconds in scores], output, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
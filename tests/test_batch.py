@@ -0,0 +1,39 @@
+import io
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import batch
+from batch import getWorkerPipeline, listDirectory, runBatch
+from gesture_pipeline import GesturePipeline
+from image_param import ImageParam
+from metrics import Metrics
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+KEY_POINTS = ("defects", "mergedPoints", "valleys", "removedFingers")
+
+
+class BatchTest(unittest.TestCase):
+
+    def testBatchMetricsMatchPipelineMetrics(self):
+        tasks = [(path, params, False) for path, params in listDirectory(IMAGES, ImageParam())][:6]
+        metrics = Metrics()
+        runBatch(tasks, 2, io.StringIO(), threads=True, metrics=metrics)
+        expected = Metrics()
+        pipeline = GesturePipeline(metrics=expected)
+        for path, params, _ in tasks:
+            pipeline.evaluateFile(path, params)["gesture"]
+        for name in ("hands",) + KEY_POINTS:
+            with self.subTest(name=name):
+                self.assertEqual(metrics.counters[name], expected.counters[name])
+
+    def testThreadsShareWorkerPipeline(self):
+        batch.workerPipelines.clear()
+        self.addCleanup(batch.workerPipelines.clear)
+        with ThreadPoolExecutor(8) as executor:
+            pipelines = list(executor.map(lambda _: getWorkerPipeline(), range(64)))
+        self.assertEqual(len({id(pipeline) for pipeline in pipelines}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
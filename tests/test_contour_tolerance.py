@@ -0,0 +1,29 @@
+import os
+import unittest
+
+from cv2 import imread
+
+from batch import readManifestEntries
+from exceptions import HandNotFoundError
+from gesture_pipeline import GesturePipeline
+from image_param import ImageParam
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+
+class ContourToleranceTest(unittest.TestCase):
+
+    def testSimplifiedContoursDoNotFailRecognition(self):
+        pipeline = GesturePipeline()
+        for path, overrides in readManifestEntries(os.path.join(IMAGES, "manifest.txt")):
+            image = imread(path)
+            for tolerance in (0.0005, 0.001, 0.002, 0.01):
+                with self.subTest(path=path, tolerance=tolerance):
+                    try:
+                        pipeline.predict(image, ImageParam(contourTolerance=tolerance).setParams(**overrides))
+                    except HandNotFoundError:
+                        pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import random
+import unittest
+
+import numpy as np
+from cv2 import imread
+
+from batch import readManifestEntries
+from exceptions import HandNotFoundError
+from gesture_pipeline import GesturePipeline
+from hand_finger_detection import findFingerValleys, findFingerValleysMask
+from image_param import ImageParam
+from img_contours import getConvexPoints, getDefectGeometry
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+
+def randomDefects(rand: random.Random, contourLength: int) -> np.ndarray:
+    defects = [[rand.randrange(contourLength) for _ in range(3)] + [rand.randint(0, 1 << 16)]
+               for _ in range(rand.randint(0, 12))]
+    return np.array(defects, dtype=np.int32).reshape(-1, 1, 4) if defects else None
+
+
+class ConvexityDefectsTest(unittest.TestCase):
+
+    def assertSameDefects(self, contour: np.ndarray, defects: np.ndarray):
+        geometry = getDefectGeometry(contour, defects)
+        expected = getConvexPoints(contour, defects if defects is not None else [], type="all")
+        actual = list(zip(*(map(tuple, points.tolist()) for points in (geometry.start, geometry.end, geometry.far))))
+        self.assertEqual(actual, expected)
+        if defects is not None:
+            self.assertEqual(geometry.depth.tolist(), defects[:, 0, 3].tolist())
+        valleys = [defect for defect, valley in zip(actual, findFingerValleysMask(*geometry[:3])) if valley]
+        self.assertEqual(valleys, findFingerValleys(actual))
+
+    def testRandomDefects(self):
+        rand = random.Random(7)
+        for i in range(2000):
+            # a small coordinate range makes degenerate and right-angled defect triangles common
+            size = rand.choice([3, 10, 400])
+            contour = np.array([[[rand.randint(0, size), rand.randint(0, size)]]
+                                for _ in range(rand.randint(1, 20))], dtype=np.int32)
+            with self.subTest(i=i):
+                self.assertSameDefects(contour, randomDefects(rand, len(contour)))
+
+    def testCorpusDefects(self):
+        pipeline = GesturePipeline()
+        for path, overrides in readManifestEntries(os.path.join(IMAGES, "manifest.txt")):
+            try:
+                evaluation = pipeline.evaluate(imread(path), ImageParam().setParams(**overrides))
+                contour, defects = evaluation["maxContour"], evaluation["defects"]
+            except HandNotFoundError:
+                continue
+            with self.subTest(path=path):
+                self.assertSameDefects(contour, defects)
+
+
+if __name__ == "__main__":
+    unittest.main()
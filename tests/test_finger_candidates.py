@@ -0,0 +1,92 @@
+import os
+import random
+import unittest
+
+from cv2 import imread
+
+from batch import readManifestEntries
+from exceptions import HandNotFoundError
+from gesture_pipeline import GesturePipeline
+from hand_finger_detection import FingerCandidates, calculateRootToPointsDistances, removeCollinearFingers, \
+    removeFalseFingers
+from image_param import ImageParam, DEFAULT_PARAMS
+from math_util import calculateLineSlope
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+
+def filterFingersLegacy(points: list, rootPoint: tuple, params: ImageParam) -> tuple:
+    """
+    Finger filtering of findFingerParams before FingerCandidates.
+    :return: possible fingers, their root distances and found fingers
+    """
+    distances, _ = calculateRootToPointsDistances(rootPoint, points)
+    possibleFingers = [point for point in points
+                       if not params.cutoffAngles[0] <= calculateLineSlope(rootPoint, point) + params.angleOffset
+                       <= params.cutoffAngles[1]]
+    possibleFingers = removeCollinearFingers(possibleFingers, params)
+    fingerDistances = {finger: dist for finger, dist in distances.items() if finger in possibleFingers}
+    foundFingers = possibleFingers
+    if len(fingerDistances) > 5:
+        foundFingers = removeFalseFingers(fingerDistances)
+    return possibleFingers, fingerDistances, foundFingers
+
+
+def filterFingers(points: list, rootPoint: tuple, params: ImageParam) -> tuple:
+    distances, _ = calculateRootToPointsDistances(rootPoint, points)
+    candidates = FingerCandidates(points, [distances[point] for point in points], rootPoint)
+    candidates.removeCutoffAngles(params)
+    candidates.removeCollinear(params)
+    possibleFingers, fingerDistances = candidates.fingers, candidates.fingerDistances
+    candidates.keepFarthest(5)
+    return possibleFingers, fingerDistances, candidates.fingers
+
+
+def randomParams(rand: random.Random) -> ImageParam:
+    cutoffLow, boundsLow = rand.randint(-30, 200), rand.randint(-10, 180)
+    return DEFAULT_PARAMS.setParams(angleOffset=rand.choice([0, 15, 30, rand.uniform(-90, 90)]),
+                                    cutoffAngles=(cutoffLow, cutoffLow + rand.randint(0, 120)),
+                                    angleBounds=(boundsLow, boundsLow + rand.randint(0, 90)))
+
+
+class FingerCandidatesTest(unittest.TestCase):
+
+    def assertSameFingers(self, points: list, rootPoint: tuple, params: ImageParam):
+        expected = filterFingersLegacy(points, rootPoint, params)
+        actual = filterFingers(points, rootPoint, params)
+        for name, legacy, flags in zip(("possibleFingers", "fingerDistances", "fingers"), expected, actual):
+            # the order of the points differs (set order before, contour order now), the points do not
+            self.assertEqual(len(flags), len(legacy), name)
+            self.assertEqual(set(flags), set(legacy), name)
+        self.assertEqual(actual[1], expected[1])
+
+    def testRandomPointsWithDuplicates(self):
+        rand = random.Random(25)
+        for i in range(3000):
+            # a small grid makes duplicate (also consecutive) points common
+            size = rand.choice([4, 12, 40])
+            points = [(rand.randint(0, size), rand.randint(0, size)) for _ in range(rand.randint(0, 14))]
+            if points and rand.random() < 0.3:
+                index = rand.randrange(len(points))
+                points.insert(index, points[index])
+            rootPoint = (rand.randint(0, size), size + rand.randint(0, 2))
+            with self.subTest(i=i):
+                self.assertSameFingers(points, rootPoint, randomParams(rand))
+
+    def testCorpusKeyPoints(self):
+        pipeline = GesturePipeline()
+        rand = random.Random(25)
+        for path, overrides in readManifestEntries(os.path.join(IMAGES, "manifest.txt")):
+            try:
+                fingerParams = pipeline.evaluate(imread(path), ImageParam().setParams(**overrides))["fingerParams"]
+            except HandNotFoundError:
+                continue
+            points, rootPoint = fingerParams.mergedPoints, fingerParams.rootPoint
+            with self.subTest(path=path):
+                self.assertSameFingers(points, rootPoint, ImageParam().setParams(**overrides))
+                for _ in range(50):
+                    self.assertSameFingers(points, rootPoint, randomParams(rand))
+
+
+if __name__ == "__main__":
+    unittest.main()
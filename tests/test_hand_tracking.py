@@ -0,0 +1,35 @@
+import os
+import unittest
+
+from cv2 import imread, resize, INTER_NEAREST
+
+from batch import readManifestEntries
+from gesture_pipeline import GesturePipeline
+from hand_tracking import HandTracker
+from image_param import ImageParam
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+NAMES = ("rock_1.jpg", "rock_3.jpg", "rock_12.jpg", "paper_7.jpg", "scissors_8.jpg")
+
+
+class HandTrackerTest(unittest.TestCase):
+
+    def testTrackedUpscaledFrameAgreesWithPipeline(self):
+        overrides = {os.path.basename(path): values
+                     for path, values in readManifestEntries(os.path.join(IMAGES, "manifest.txt"))}
+        pipeline = GesturePipeline()
+        for name in NAMES:
+            frame = resize(imread(os.path.join(IMAGES, name)), None, fx=4, fy=4, interpolation=INTER_NEAREST)
+            params = ImageParam(workingHeight=800).setParams(**overrides[name])
+            expected = pipeline.predict(frame, params)
+            tracker = HandTracker(pipeline)
+            for tracked in (False, True):
+                with self.subTest(name=name, tracked=tracked):
+                    result = tracker.predict(frame, params)
+                    self.assertEqual(result.tracked, tracked)
+                    self.assertEqual((result.result.gesture, result.result.credibility),
+                                     (expected.gesture, expected.credibility))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import random
+import unittest
+
+import numpy as np
+from cv2 import imread
+
+from batch import readManifestEntries
+from exceptions import HandNotFoundError
+from gesture_pipeline import GesturePipeline
+from hand_finger_detection import findClosePoints, findClosePointsArray, mergeClosePoints, mergeClosePointsArray, \
+    calculateRootToPointsDistances, calculateRootToPointsDistancesArray
+from image_param import ImageParam, DEFAULT_PARAMS
+from img_contours import getConvexPoints
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+
+def randomPoints(rand: random.Random) -> list:
+    # small steps between consecutive points make clusters of close points, duplicates included
+    points = [(rand.randint(-20, 300), rand.randint(-20, 300))]
+    for _ in range(rand.randint(0, 30)):
+        step = rand.choice([0, 2, 5, 12, 40])
+        x, y = points[-1]
+        points.append((x + rand.randint(-step, step), y + rand.randint(-step, step)))
+    return points
+
+
+class PointArraysTest(unittest.TestCase):
+
+    def assertSameMergedPoints(self, points: list, params: ImageParam):
+        expected = mergeClosePoints(findClosePoints(points, params))
+        merged = mergeClosePointsArray(points, findClosePointsArray(np.array(points).reshape(-1, 2), params))
+        self.assertEqual([tuple(point) for point in merged.tolist()], [tuple(map(int, point)) for point in expected])
+
+    def assertSameDistances(self, rootPoint: tuple, points: list):
+        expectedDistances, farthestPoint = calculateRootToPointsDistances(rootPoint, points)
+        distances, farthestIndex = calculateRootToPointsDistancesArray(rootPoint, np.array(points).reshape(-1, 2))
+        self.assertEqual(distances.tolist(), [expectedDistances[point] for point in points])
+        self.assertEqual(points[farthestIndex] if farthestIndex is not None else None, farthestPoint)
+
+    def testRandomPoints(self):
+        rand = random.Random(6)
+        for i in range(2000):
+            points = randomPoints(rand) if rand.random() < 0.95 else []
+            params = DEFAULT_PARAMS.setParams(consecutivePointsDistThreshold=rand.choice([0, 5, 10, 20, 35.5]),
+                                              consecutivePointsCoordOffset=rand.choice([0, 1, 3, 8]))
+            rootPoint = (rand.randint(-20, 300), rand.randint(-20, 300))
+            with self.subTest(i=i):
+                self.assertSameMergedPoints(points, params)
+                self.assertSameDistances(rootPoint, points)
+
+    def testCorpusKeyPoints(self):
+        pipeline = GesturePipeline()
+        for path, overrides in readManifestEntries(os.path.join(IMAGES, "manifest.txt")):
+            params = ImageParam().setParams(**overrides)
+            try:
+                evaluation = pipeline.evaluate(imread(path), params)
+                contour, defects = evaluation["maxContour"], evaluation["defects"]
+                fingerParams = evaluation["fingerParams"]
+            except HandNotFoundError:
+                continue
+            with self.subTest(path=path):
+                points = [tuple(map(int, point)) for point in getConvexPoints(contour, defects)]
+                self.assertSameMergedPoints(points, params)
+                self.assertSameDistances(fingerParams.rootPoint, fingerParams.mergedPoints)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import unittest
+
+import numpy as np
+from cv2 import imread, cvtColor, COLOR_BGR2GRAY
+
+from gesture_pipeline import GesturePipeline
+from image_param import ImageParam
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+
+class RotationCropTest(unittest.TestCase):
+
+    def assertCroppedAlike(self, evaluation):
+        prepared, gray = evaluation["prepared"], evaluation["gray"]
+        self.assertEqual(prepared.shape[:2], gray.shape)
+        difference = np.abs(cvtColor(prepared, COLOR_BGR2GRAY).astype(np.int16) - gray)
+        self.assertLess(difference.mean(), 1)
+
+    def testColorAndGrayImagesAreCroppedAlike(self):
+        pipeline = GesturePipeline()
+        for name in ("paper_1.jpg", "rock_4.jpg", "scissors_12.jpg"):
+            for params in (ImageParam(rotationAngle=17), ImageParam(rotationAngle=-30, workingHeight=300),
+                           ImageParam(rotationAngle=45, takeUpperHalf=True)):
+                with self.subTest(name=name, params=params):
+                    self.assertCroppedAlike(pipeline.evaluateFile(os.path.join(IMAGES, name), params))
+
+    def testBorderBlackOnlyInGrayscale(self):
+        # dark blue edge is not black in the color image, but it is black in the grayscale one
+        image = imread(os.path.join(IMAGES, "paper_1.jpg"))
+        image[:, :40] = (2, 0, 0)
+        pipeline = GesturePipeline()
+        for angle in (10, 17, 30):
+            with self.subTest(angle=angle):
+                self.assertCroppedAlike(pipeline.evaluate(image, ImageParam(rotationAngle=angle)))
+
+
+if __name__ == "__main__":
+    unittest.main()
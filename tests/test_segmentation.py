@@ -0,0 +1,50 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from segmentation import findLargestComponent, findComponentContours
+
+
+def componentBox(foreground: np.ndarray) -> tuple:
+    """
+    :return: bounding box of the largest component found on the full resolution mask
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(foreground, connectivity=8)
+    label = 1 + int(stats[1:, cv2.CC_STAT_AREA].argmax())
+    return tuple(int(value) for value in stats[label, :cv2.CC_STAT_AREA])
+
+
+def contains(box: tuple, inner: tuple) -> bool:
+    x, y, w, h = box
+    ix, iy, iw, ih = inner
+    return x <= ix and y <= iy and ix + iw <= x + w and iy + ih <= y + h
+
+
+class LargestComponentTest(unittest.TestCase):
+
+    def testComponentAtEdgesOfUnevenImage(self):
+        for reduction in (2, 3, 4, 7):
+            foreground = np.zeros((803, 601), dtype=np.uint8)
+            # component touching the right and bottom edge, ending in a thin line in the last partial blocks
+            foreground[640:803, 450:600] = 255
+            foreground[700, 450:601] = 255
+            foreground[640:803, 600] = 255
+            foreground[20:30, 20:30] = 255
+            with self.subTest(reduction=reduction):
+                expected = componentBox(foreground)
+                box = findLargestComponent(foreground, reduction)
+                self.assertTrue(contains(box, expected), (box, expected))
+                self.assertTrue(contains((0, 0, 601, 803), box), box)
+                contour, = findComponentContours(foreground, reduction=reduction)
+                self.assertEqual(cv2.boundingRect(contour), expected)
+
+    def testSinglePixelComponents(self):
+        foreground = np.zeros((10, 9), dtype=np.uint8)
+        foreground[9, 8] = 255
+        self.assertTrue(contains(findLargestComponent(foreground, 4), (8, 9, 1, 1)))
+        self.assertIsNone(findLargestComponent(np.zeros((10, 9), dtype=np.uint8), 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from stage_cache import StageCache, encodeStageOutput, decodeStageOutput, RESCAN_FRACTION
+
+
+def directorySize(directory: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".npz"))
+
+
+class StageCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def testEmptyContourListRoundTrip(self):
+        self.assertEqual(decodeStageOutput(encodeStageOutput([])), [])
+        cache = StageCache(self.directory.name)
+        cache[("contours", "handless")] = ([], 0.0)
+        self.assertEqual(StageCache(self.directory.name)[("contours", "handless")], ([], 0.0))
+
+    def testContourListRoundTrip(self):
+        contours = [np.arange(8, dtype=np.int32).reshape(-1, 1, 2), np.arange(2, dtype=np.int32).reshape(-1, 1, 2)]
+        cache = StageCache(self.directory.name)
+        cache[("contours", "hand")] = (contours, 0.0)
+        decoded, _ = StageCache(self.directory.name)[("contours", "hand")]
+        self.assertEqual(len(decoded), len(contours))
+        for contour, expected in zip(decoded, contours):
+            np.testing.assert_array_equal(contour, expected)
+
+    def testCachesSharingDirectoryStayWithinLimit(self):
+        value = np.zeros((64, 1, 2), dtype=np.int32)
+        entryBytes = len(encodeStageOutput(value)["array"].tobytes())
+        maxBytes = 40 * entryBytes
+        caches = [StageCache(self.directory.name, maxBytes) for _ in range(4)]
+        for i in range(400):
+            caches[i % len(caches)][("maxContour", i)] = (value, 0.0)
+        self.assertLessEqual(directorySize(self.directory.name), maxBytes + len(caches) * maxBytes / RESCAN_FRACTION)
+
+    def testThreadsWritingSameEntries(self):
+        cache = StageCache(self.directory.name)
+        values = [np.full((16, 1, 2), i, dtype=np.int32) for i in range(8)]
+
+        def write(i):
+            cache[("maxContour", i % 2)] = (values[i], 0.0)
+
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(write, list(range(len(values))) * 8))
+        self.assertEqual(sorted(entry.name[-4:] for entry in os.scandir(self.directory.name)), [".npz", ".npz"])
+        self.assertEqual(cache.totalBytes, directorySize(self.directory.name))
+
+
+if __name__ == "__main__":
+    unittest.main()
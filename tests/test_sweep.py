@@ -0,0 +1,30 @@
+import os
+import unittest
+from contextlib import redirect_stderr
+from io import StringIO
+
+from image_param import ImageParam
+from sweep import evaluateImage
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+
+class EvaluateImageTest(unittest.TestCase):
+
+    def testUnreadableImageIsNotRecognized(self):
+        configs = [ImageParam(), ImageParam(valleyDepthThreshold=50)]
+        with redirect_stderr(StringIO()) as errors:
+            label, results = evaluateImage((os.path.join(IMAGES, "rock_missing.jpg"), {}, configs))
+        self.assertEqual(label, "rock")
+        self.assertEqual([gesture for gesture, _ in results], [None, None])
+        self.assertIn("ImageNotFoundError", errors.getvalue())
+
+    def testFailingConfigDoesNotAbortOthers(self):
+        configs = [ImageParam(segmentation=99), ImageParam()]
+        with redirect_stderr(StringIO()):
+            label, results = evaluateImage((os.path.join(IMAGES, "rock_1.jpg"), {}, configs))
+        self.assertEqual([gesture for gesture, _ in results], [None, "rock"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import unittest
+
+from cv2 import imread, resize, INTER_NEAREST
+
+from constants import WORKING_HEIGHT
+from gesture_pipeline import GesturePipeline, findParamScale
+from image_param import ImageParam
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+
+class WorkingHeightTest(unittest.TestCase):
+
+    def testParamScaleIsRelativeToTunedHeight(self):
+        self.assertEqual(findParamScale(ImageParam()), 1.0)
+        self.assertEqual(findParamScale(ImageParam(workingHeight=WORKING_HEIGHT)), 1.0)
+        self.assertEqual(findParamScale(ImageParam(workingHeight=WORKING_HEIGHT // 2)), 0.5)
+
+    def testUpscaledImageGivesSameResult(self):
+        pipeline = GesturePipeline()
+        for name, params in (("paper_1.jpg", ImageParam()), ("scissors_1.jpg", ImageParam()),
+                             ("rock_1.jpg", ImageParam())):
+            image = imread(os.path.join(IMAGES, name))
+            original = pipeline.predict(image, params)
+            upscaled = resize(image, None, fx=4, fy=4, interpolation=INTER_NEAREST)
+            working = params.setParams(workingHeight=image.shape[0])
+            for candidate in (image, upscaled):
+                result = pipeline.predict(candidate, working)
+                factor = candidate.shape[0] / image.shape[0]
+                with self.subTest(name=name, height=candidate.shape[0]):
+                    self.assertEqual((result.gesture, result.credibility), (original.gesture, original.credibility))
+                    self.assertEqual(len(result.fingers), len(original.fingers))
+                    for point, expected in zip(result.fingers, original.fingers):
+                        self.assertAlmostEqual(point[0] / factor, expected[0], delta=1)
+                        self.assertAlmostEqual(point[1] / factor, expected[1], delta=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
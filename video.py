@@ -0,0 +1,263 @@
+"""
+Gesture recognition on video files (or image sequences) - one result per processed frame.
+
+    python video.py --video clip.mp4 [--fps 10] [--smooth 5] [--output results.jsonl] [--angleOffset 15 ...]
+    python video.py --video "frames/frame_%04d.jpg" --fps 5
+    python video.py --video clip.mp4 --track [--padding 0.25]
+    python video.py --video clip.mp4 --workers 4
+
+Frames are decoded one at a time by a generator (memory does not grow with the clip length). With --fps, frames are
+skipped (grabbed, but not decoded) to follow the target frame rate of the clip timeline. With --smooth N, gesture
+smoothed by majority vote over the last N processed frames is reported as well. Results are streamed as JSON lines,
+sustained processing frame rate is written to stderr. With --track, only the padded bounding box of the hand found
+in the previous frame is processed (whole frame when the hand is lost), "roi" of the results is the processed region.
+With --workers N, frames are recognized in N worker processes - frames are passed to the workers through a ring of
+shared memory slots (not pickled), results are reported in order of the frames.
+"""
+import json
+import sys
+import time
+from argparse import ArgumentParser
+from collections import Counter, deque
+from itertools import chain
+from multiprocessing import Pool
+from typing import NamedTuple, Iterator
+
+from cv2 import VideoCapture, CAP_PROP_FPS
+from numpy import ndarray
+
+from constants import ROI_PADDING
+from batch import getWorkerPipeline
+from exceptions import ImageNotFoundError
+from frame_ring import FrameRing, SharedFrame
+from gesture_pipeline import GesturePipeline
+from hand_tracking import HandTracker
+from image_param import ImageParam, DEFAULT_PARAMS
+from io_utils import parseArguments
+
+# frame ring of the worker process - attached by the pool initializer
+workerRing = None
+
+
+class Frame(NamedTuple):
+    index: int
+    timestamp: float
+    image: ndarray
+
+
+class FrameResult(NamedTuple):
+    index: int
+    timestamp: float
+    gesture: str
+    credibility: str
+    smoothedGesture: str
+    latencyMs: float
+    error: str = None
+    roi: tuple = None
+
+    def toDict(self) -> dict:
+        """
+        :return: result as a JSON-serializable dict
+        """
+        return {key: value for key, value in self._asdict().items() if value is not None or key not in ("error", "roi")}
+
+
+def readFrames(source: str, targetFps: float = None) -> Iterator[Frame]:
+    """
+    Reads frames of the video file one at a time.
+    :param source: video file path (or image sequence pattern, e.g. frame_%04d.jpg)
+    :param targetFps: frame rate to follow by skipping frames (all frames are read if not given or if frame rate of
+    the source is unknown)
+    :return: generator of frames
+    """
+    capture = VideoCapture(source)
+    if not capture.isOpened():
+        raise ImageNotFoundError(f"Video file {source} cannot be opened.")
+    try:
+        sourceFps = capture.get(CAP_PROP_FPS)
+        frameInterval = 1 / sourceFps if sourceFps > 0 else 0.0
+        skipInterval = 1 / targetFps if targetFps and sourceFps > targetFps else 0.0
+        nextTimestamp = 0.0
+        index = 0
+        while capture.grab():
+            timestamp = index * frameInterval
+            if timestamp + 1e-9 >= nextTimestamp:
+                success, image = capture.retrieve()
+                if not success:
+                    break
+                yield Frame(index, timestamp, image)
+                nextTimestamp += skipInterval
+            index += 1
+    finally:
+        capture.release()
+
+
+class GestureSmoother:
+    """
+    Temporal smoothing of the recognized gestures - majority vote over the last frames where a gesture was
+    recognized (ties are resolved in favour of the most recent gesture).
+    """
+
+    def __init__(self, window: int = 5):
+        self.gestures = deque(maxlen=max(1, window))
+
+    def update(self, gesture: str) -> str:
+        """
+        :param gesture: gesture recognized on the current frame (None if not recognized)
+        :return: smoothed gesture (None if no gesture was recognized in the window)
+        """
+        if gesture is not None:
+            self.gestures.append(gesture)
+        if not self.gestures:
+            return None
+        votes = Counter(self.gestures)
+        maxVotes = max(votes.values())
+        return next(g for g in reversed(self.gestures) if votes[g] == maxVotes)
+
+
+def recognizeFrames(frames: Iterator[Frame], params: ImageParam = DEFAULT_PARAMS, smoothingWindow: int = 1,
+                    pipeline: GesturePipeline = None, tracker: HandTracker = None) -> Iterator[FrameResult]:
+    """
+    Recognizes gesture on every frame.
+    :param frames: frames (e.g. readFrames generator)
+    :param params: image parameters
+    :param smoothingWindow: number of frames of the majority vote
+    :param pipeline: recognition pipeline (new one if not given)
+    :param tracker: hand tracker - if given, only the region of the hand from the previous frame is processed
+    :return: generator of frame results
+    """
+    pipeline = pipeline or GesturePipeline()
+    smoother = GestureSmoother(smoothingWindow)
+    for frame in frames:
+        start = time.perf_counter()
+        gesture = credibility = error = roi = None
+        try:
+            if tracker is not None:
+                result, roi, _ = tracker.predict(frame.image, params)
+            else:
+                result = pipeline.predict(frame.image, params)
+            gesture, credibility = result.gesture, result.credibility
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        latencyMs = round((time.perf_counter() - start) * 1000, 3)
+        yield FrameResult(frame.index, round(frame.timestamp, 3), gesture, credibility, smoother.update(gesture),
+                          latencyMs, error, roi)
+
+
+def attachWorkerRing(names: list) -> None:
+    """
+    Pool initializer - attaches the worker process to the frame ring.
+    :param names: names of the ring slots
+    """
+    global workerRing
+    workerRing = FrameRing.attach(names)
+
+
+def recognizeSharedFrame(task: tuple) -> tuple:
+    """
+    Recognizes gesture on the frame in the shared memory slot - meant to be run in a worker process.
+    :param task: (shared frame reference, image parameters)
+    :return: (gesture, credibility, latency in ms, error)
+    """
+    frame, params = task
+    start = time.perf_counter()
+    gesture = credibility = error = None
+    try:
+        result = getWorkerPipeline().predict(workerRing.view(frame), params)
+        gesture, credibility = result.gesture, result.credibility
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return gesture, credibility, round((time.perf_counter() - start) * 1000, 3), error
+
+
+def recognizeFramesInWorkers(frames: Iterator[Frame], params: ImageParam = DEFAULT_PARAMS, smoothingWindow: int = 1,
+                             workers: int = 2, slotsPerWorker: int = 2) -> Iterator[FrameResult]:
+    """
+    Recognizes gesture on every frame in a pool of worker processes. Frames are written into a ring of shared memory
+    slots (sized by the first frame) and the workers get only the slot references. When all slots are in use, the
+    oldest frame is waited for, so at most workers * slotsPerWorker frames are in flight.
+    :param frames: frames (e.g. readFrames generator)
+    :param params: image parameters
+    :param smoothingWindow: number of frames of the majority vote
+    :param workers: number of worker processes
+    :param slotsPerWorker: number of ring slots per worker
+    :return: generator of frame results, in order of the frames
+    """
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        return
+    smoother = GestureSmoother(smoothingWindow)
+    ring = FrameRing.create(workers * max(1, slotsPerWorker), first.image.nbytes)
+    free = list(range(ring.slots))
+    pending = deque()
+
+    def collect() -> FrameResult:
+        frame, shared, task = pending.popleft()
+        gesture, credibility, latencyMs, error = task.get()
+        free.append(shared.slot)
+        return FrameResult(frame.index, round(frame.timestamp, 3), gesture, credibility, smoother.update(gesture),
+                           latencyMs, error)
+
+    try:
+        with Pool(workers, attachWorkerRing, (ring.names,)) as pool:
+            for frame in chain([first], frames):
+                if not free:
+                    yield collect()
+                slot = free.pop()
+                try:
+                    shared = ring.write(slot, frame.image)
+                except ValueError as e:
+                    # frame larger than the first one - reported in order, after the frames in flight
+                    free.append(slot)
+                    while pending:
+                        yield collect()
+                    yield FrameResult(frame.index, round(frame.timestamp, 3), None, None, smoother.update(None), 0.0,
+                                      f"{type(e).__name__}: {e}")
+                    continue
+                pending.append((frame, shared, pool.apply_async(recognizeSharedFrame, ((shared, params),))))
+            while pending:
+                yield collect()
+    finally:
+        ring.close()
+
+
+def main(arguments: list):
+    parser = ArgumentParser(description="Rock-paper-scissors gesture recognition on video files.")
+    parser.add_argument("--video", required=True, help="video file (or image sequence pattern)")
+    parser.add_argument("--fps", type=float, help="target frame rate - frames above it are skipped")
+    parser.add_argument("--smooth", type=int, default=1, help="number of frames of the gesture majority vote")
+    parser.add_argument("--track", action="store_true", help="process only the hand region of the previous frame")
+    parser.add_argument("--padding", type=float, default=ROI_PADDING, help="relative padding of the tracked region")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (frames are passed "
+                                                                 "through shared memory)")
+    parser.add_argument("--output", help="JSON lines output file (default: stdout)")
+    args, paramArguments = parser.parse_known_args(arguments)
+    params = parseArguments(paramArguments)
+    if args.track and args.workers > 1:
+        parser.error("--track processes frames one after another and cannot be combined with --workers")
+
+    pipeline = GesturePipeline()
+    tracker = HandTracker(pipeline, args.padding) if args.track else None
+    output = open(args.output, "w") if args.output else sys.stdout
+    frames = 0
+    start = time.perf_counter()
+    try:
+        source = readFrames(args.video, args.fps)
+        if args.workers > 1:
+            results = recognizeFramesInWorkers(source, params, args.smooth, args.workers)
+        else:
+            results = recognizeFrames(source, params, args.smooth, pipeline, tracker)
+        for result in results:
+            output.write(json.dumps(result.toDict()) + "\n")
+            frames += 1
+    finally:
+        if args.output:
+            output.close()
+    seconds = time.perf_counter() - start
+    fps = frames / seconds if seconds > 0 else 0.0
+    print(f"{frames} frames processed in {seconds:.2f} s - sustained {fps:.2f} frames/s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])